@@ -8,6 +8,7 @@ This is the KILLER FEATURE that differentiates SparkPlan from competitors.
 """
 
 from pydantic_ai import Agent, RunContext
+from agents.model import gemini_model
 from models.schemas import (
     ChangeImpact,
     ServiceImpact,
@@ -21,20 +22,65 @@ from tools.database import (
     get_project_data,
     get_all_panels,
     get_all_feeders,
-    get_service_utilization,
+    get_all_circuits,
     check_service_capacity,
     get_panel_utilization,
-    get_large_loads
+    get_change_impact_context,
+    build_panel_name_index
 )
 from supabase import Client
 from typing import List, Dict, Any
+from tools.cache import TTLCache
+from config import settings
+from operator import itemgetter
+import asyncio
+import hashlib
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Map conductor sizes to circular mils (simplified)
+CONDUCTOR_CMIL = {
+    "#14": 4110,
+    "#12": 6530,
+    "#10": 10380,
+    "#8": 16510,
+    "#6": 26240,
+    "#4": 41740,
+    "#3": 52620,
+    "#2": 66360,
+    "#1": 83690,
+    "#1/0": 105600,
+    "#2/0": 133100,
+    "#3/0": 167800,
+    "#4/0": 211600,
+}
+DEFAULT_CONDUCTOR_SIZE = "#1/0"
+
+# K-factor divided by circular mils, precomputed per conductor size (K = 12.9 for Cu)
+_VDROP_K_CU_OVER_CMIL = {size: 12.9 / cmil for size, cmil in CONDUCTOR_CMIL.items()}
+
+# Identical change impact requests are served from cache; bump the version
+# whenever the ChangeImpact schema or prompts change
+CHANGE_IMPACT_CACHE_VERSION = 1
+_impact_cache = TTLCache(maxsize=1024, ttl=600)
+
+# Circuit fields that change panel headroom; hashed into the cache key
+IMPACT_KEY_CIRCUIT_COLUMNS = 'id,panel_id,breaker_amps,pole,load_watts,conductor_size'
+
+# Columns fetched for the get_panels_data / get_feeders_data tools
+PANEL_TOOL_COLUMNS = 'name,bus_rating,voltage,phase,main_breaker_amps,is_main'
+FEEDER_TOOL_COLUMNS = 'name,phase_conductor_size,conductor_material,distance_ft,voltage_drop_percent'
+_panel_tool_fields = itemgetter(*PANEL_TOOL_COLUMNS.split(','))
+_feeder_tool_fields = itemgetter(*FEEDER_TOOL_COLUMNS.split(','))
+
+# Largest existing loads listed in the system prompt
+LARGE_LOAD_PROMPT_LIMIT = 10
+
 # Create Pydantic AI agent
 change_impact_agent = Agent(
-    'gemini-2.0-flash-exp',
+    gemini_model,
     output_type=ChangeImpact,
     system_prompt="""You are an expert electrical engineer specializing in NEC compliance and electrical system design.
 
@@ -72,13 +118,19 @@ Your role is to analyze the impact of proposed changes to electrical systems.
 )
 
 
+def _json_block(data: Any) -> str:
+    """Render data as a fenced JSON block for the prompt"""
+    return f"```json\n{orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()}\n```"
+
+
 @change_impact_agent.system_prompt
 async def add_project_context(ctx: RunContext[Dict[str, Any]]) -> str:
     """
     Dynamically inject comprehensive project context into system prompt
 
     Args:
-        ctx: Run context with supabase client, project_id, and proposed_load_amps
+        ctx: Run context with supabase client, project_id, proposed_load_amps,
+            and optionally capacity_pre_check
 
     Returns:
         Detailed context about the project including capacity pre-check
@@ -87,26 +139,25 @@ async def add_project_context(ctx: RunContext[Dict[str, Any]]) -> str:
     project_id: str = ctx.deps['project_id']
     proposed_load_amps: float = ctx.deps.get('proposed_load_amps', 0)
 
-    # Fetch project data
-    project = await get_project_data(supabase, project_id)
-    if not project:
+    # Project, service utilization, capacity check, panel utilization and
+    # large loads all come from a single database round trip
+    impact_context = await get_change_impact_context(
+        supabase, project_id, proposed_load_amps, large_load_limit=LARGE_LOAD_PROMPT_LIMIT
+    )
+    if not impact_context:
         return "Project data unavailable."
 
-    # Fetch service utilization
-    service_util = await get_service_utilization(supabase, project_id)
-
-    # Pre-check service capacity
-    capacity_check = await check_service_capacity(supabase, project_id, proposed_load_amps)
+    project = impact_context['project']
+    service_util = impact_context['service_utilization']
+    panel_details = impact_context['panel_utilization']
+    large_loads = impact_context['large_loads']
 
-    # Fetch panels with utilization
-    panels = await get_all_panels(supabase, project_id)
-    panel_details = []
-    for panel in panels:
-        panel_util = await get_panel_utilization(supabase, panel['id'])
-        panel_details.append(panel_util)
+    # Panel lookups by name for check_panel_capacity during this run
+    ctx.deps['panels_by_name'] = build_panel_name_index(impact_context['panels'])
 
-    # Fetch large loads
-    large_loads = await get_large_loads(supabase, project_id, min_amps=20)
+    # Prefer the pre-check from analyze_change_impact so the prompt and the
+    # post-run safety check agree
+    capacity_check = ctx.deps.get('capacity_pre_check') or impact_context['capacity_check']
 
     # Build detailed context
     service_size = service_util.get('service_size', 200)
@@ -115,6 +166,14 @@ async def add_project_context(ctx: RunContext[Dict[str, Any]]) -> str:
     current_load_amps = current_load_va / voltage if voltage > 0 else 0
     available_amps = service_size - current_load_amps
 
+    upgrade_line = (
+        f">>> RECOMMENDED UPGRADE: {capacity_check.get('recommended_service_size')}A service"
+        if capacity_check.get('requires_service_upgrade') else ""
+    )
+    # Panels and large loads are rendered as JSON blocks
+    panel_summary = _json_block(panel_details) if panel_details else "No panels configured"
+    large_load_summary = _json_block(large_loads) if large_loads else "No large loads found"
+
     context = f"""
 ## Current Project Context
 
@@ -137,13 +196,13 @@ Remaining After Change: {capacity_check.get('remaining_after_change_amps', 0)}A
 
 >>> VERDICT: {capacity_check.get('verdict', 'Unknown')}
 ```
-{">>> RECOMMENDED UPGRADE: " + str(capacity_check.get('recommended_service_size')) + "A service" if capacity_check.get('requires_service_upgrade') else ""}
+{upgrade_line}
 
 ### Panel Summary
-{chr(10).join([f"- **{p.get('panel_name', 'Panel')}**: {p.get('current_load_amps', 0)}A / {p.get('bus_rating_amps', 0)}A ({p.get('utilization_percent', 0)}%), {p.get('spaces_available', 0)} spaces available - {p.get('status', 'Unknown')}" for p in panel_details]) if panel_details else "No panels configured"}
+{panel_summary}
 
 ### Existing Large Loads (≥20A)
-{chr(10).join([f"- {l.get('description', 'Unknown')}: {l.get('breaker_amps', 0)}A" for l in large_loads[:10]]) if large_loads else "No large loads found"}
+{large_load_summary}
 
 ---
 **IMPORTANT:** The VERDICT above is the authoritative capacity check. If it says REJECT, you MUST set can_accommodate=False.
@@ -162,17 +221,17 @@ async def get_panels_data(ctx: RunContext[Dict[str, Any]]) -> List[Dict[str, Any
     supabase: Client = ctx.deps['supabase']
     project_id: str = ctx.deps['project_id']
 
-    panels = await get_all_panels(supabase, project_id)
+    panels = await get_all_panels(supabase, project_id, columns=PANEL_TOOL_COLUMNS)
 
-    # Simplify panel data for AI
+    # Simplify panel data for AI - projected columns are always present
     return [{
-        "name": p.get('name'),
-        "rating": f"{p.get('bus_rating', 0)}A",
-        "voltage": f"{p.get('voltage', 240)}V",
-        "phases": p.get('phases', 1),
-        "main_breaker": f"{p.get('main_breaker_rating', 0)}A",
-        "type": p.get('panel_type', 'Unknown')
-    } for p in panels]
+        "name": name,
+        "rating": f"{bus_rating}A",
+        "voltage": f"{voltage}V",
+        "phases": phase,
+        "main_breaker": f"{main_breaker_amps or 0}A",
+        "type": "Main" if is_main else "Subpanel"
+    } for name, bus_rating, voltage, phase, main_breaker_amps, is_main in map(_panel_tool_fields, panels)]
 
 
 @change_impact_agent.tool
@@ -186,16 +245,15 @@ async def get_feeders_data(ctx: RunContext[Dict[str, Any]]) -> List[Dict[str, An
     supabase: Client = ctx.deps['supabase']
     project_id: str = ctx.deps['project_id']
 
-    feeders = await get_all_feeders(supabase, project_id)
+    feeders = await get_all_feeders(supabase, project_id, columns=FEEDER_TOOL_COLUMNS)
 
     return [{
-        "name": f.get('name'),
-        "conductor_size": f.get('conductor_size'),
-        "material": f.get('conductor_material', 'Cu'),
-        "length": f.get('length_feet', 0),
-        "ampacity": f.get('ampacity', 0),
-        "voltage_drop": f.get('voltage_drop_percent', 0)
-    } for f in feeders]
+        "name": name,
+        "conductor_size": conductor_size,
+        "material": material,
+        "length": length,
+        "voltage_drop": voltage_drop or 0
+    } for name, conductor_size, material, length, voltage_drop in map(_feeder_tool_fields, feeders)]
 
 
 @change_impact_agent.tool
@@ -215,8 +273,12 @@ async def check_panel_capacity(
     supabase: Client = ctx.deps['supabase']
     project_id: str = ctx.deps['project_id']
 
-    panels = await get_all_panels(supabase, project_id)
-    panel = next((p for p in panels if p.get('name', '').lower() == panel_name.lower()), None)
+    panels_by_name = ctx.deps.get('panels_by_name')
+    if panels_by_name is None:
+        panels_by_name = build_panel_name_index(await get_all_panels(supabase, project_id, columns='id,name'))
+        ctx.deps['panels_by_name'] = panels_by_name
+
+    panel = panels_by_name.get(panel_name.casefold())
 
     if not panel:
         return {"error": f"Panel '{panel_name}' not found"}
@@ -265,33 +327,82 @@ async def calculate_voltage_drop(
         Voltage drop percentage
     """
     # Simplified voltage drop calculation (K-factor method)
-    # K = 12.9 for Cu, 21.2 for Al
-
-    # Map conductor sizes to circular mils (simplified)
-    conductor_cmil = {
-        "#14": 4110,
-        "#12": 6530,
-        "#10": 10380,
-        "#8": 16510,
-        "#6": 26240,
-        "#4": 41740,
-        "#3": 52620,
-        "#2": 66360,
-        "#1": 83690,
-        "#1/0": 105600,
-        "#2/0": 133100,
-        "#3/0": 167800,
-        "#4/0": 211600,
-    }
-
-    cmil = conductor_cmil.get(conductor_size, 105600)  # Default to #1/0
-    K = 12.9  # Copper
-
-    # Vdrop = K × I × L / CM
-    vdrop_volts = (K * load_amps * length_feet) / cmil
-    vdrop_percent = (vdrop_volts / voltage) * 100
-
-    return round(vdrop_percent, 2)
+    # Vdrop% = (K × I × L / CM) / V × 100, with K/CM precomputed per conductor
+    k_cm = _VDROP_K_CU_OVER_CMIL.get(conductor_size, _VDROP_K_CU_OVER_CMIL[DEFAULT_CONDUCTOR_SIZE])
+
+    return round(k_cm * load_amps * length_feet / voltage * 100, 2)
+
+
+def _impact_cache_key(
+    project_id: str,
+    project: Dict[str, Any],
+    change_description: str,
+    proposed_loads: List[Dict[str, Any]],
+    capacity_check: Dict[str, Any],
+    panels: List[Dict[str, Any]],
+    feeders: List[Dict[str, Any]],
+    circuits: List[Dict[str, Any]]
+) -> tuple:
+    """
+    Deterministic cache key for a change impact analysis
+
+    Includes the project's updated_at, the capacity pre-check (which reflects
+    the current connected load) and the panel, feeder and circuit rows. Those
+    edits do not bump projects.updated_at, and moving or resizing circuits can
+    change panel headroom without changing the service total, so they must be
+    part of the key.
+    """
+    canonical = orjson.dumps(
+        {
+            "version": CHANGE_IMPACT_CACHE_VERSION,
+            "project_updated_at": (project or {}).get('updated_at'),
+            "panels": sorted(panels, key=lambda p: str(p.get('id'))),
+            "feeders": sorted(feeders, key=lambda f: str(f.get('id'))),
+            "circuits": sorted(circuits, key=lambda c: str(c.get('id'))),
+            "description": change_description,
+            "loads": sorted(
+                proposed_loads,
+                key=lambda l: (str(l.get('type', '')), l.get('amps', 0), l.get('quantity', 1))
+            ),
+            "capacity": capacity_check
+        },
+        option=orjson.OPT_SORT_KEYS
+    )
+    return project_id, hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+
+def _is_rejected(capacity_check: Dict[str, Any]) -> bool:
+    """True when the capacity pre-check unambiguously rejects the change"""
+    return bool(capacity_check.get('requires_service_upgrade')) and \
+        capacity_check.get('verdict', '').startswith('REJECT')
+
+
+def _build_rejected_impact(capacity_check: Dict[str, Any], total_additional_amps: float) -> ChangeImpact:
+    """Build the change impact result for a change the service cannot carry"""
+    service_size = capacity_check.get('service_size_amps', 200)
+    recommended_size = capacity_check.get('recommended_service_size')
+
+    return ChangeImpact(
+        can_accommodate=False,
+        impact_summary=(
+            f"Current {capacity_check.get('current_load_amps', 0)}A + proposed {total_additional_amps}A = "
+            f"{capacity_check.get('new_total_amps', 0)}A, which exceeds the {service_size}A service. "
+            f"{capacity_check.get('verdict', '')}"
+        ),
+        service_impact=ServiceImpact(
+            upgrade_needed=True,
+            current_size=int(service_size),
+            required_size=recommended_size,
+            utilization_before=capacity_check.get('current_utilization_percent', 0),
+            utilization_after=capacity_check.get('new_utilization_percent', 0),
+            reason="Proposed load exceeds 100% of service capacity (NEC 230.42, 220)"
+        ),
+        recommendations=[
+            f"Upgrade to {recommended_size}A service before adding this load" if recommended_size
+            else "Upgrade the service before adding this load",
+            "Re-run the impact analysis once the service upgrade is designed to check feeders, panels and voltage drop"
+        ]
+    )
 
 
 async def analyze_change_impact(
@@ -312,22 +423,44 @@ async def analyze_change_impact(
     Returns:
         Complete impact analysis with recommendations
     """
-    # Calculate total additional load
-    total_additional_amps = sum(
-        load.get('amps', 0) * load.get('quantity', 1)
-        for load in proposed_loads
-    )
+    # Calculate total additional load and the load summary in a single pass
+    total_additional_amps = 0
+    load_descriptions = []
+    for load in proposed_loads:
+        amps = load.get('amps', 0)
+        quantity = load.get('quantity', 1)
+        total_additional_amps += amps * quantity
+        load_descriptions.append(f"{quantity}x {load.get('type')} @ {load.get('amps')}A")
 
     # Pre-check capacity before even running AI
     capacity_pre_check = await check_service_capacity(supabase, project_id, total_additional_amps)
 
+    # A REJECT verdict is deterministic - answer without an LLM round trip
+    if settings.skip_llm_on_reject and _is_rejected(capacity_pre_check):
+        logger.info("Capacity pre-check rejected change, skipping LLM analysis")
+        return _build_rejected_impact(capacity_pre_check, total_additional_amps)
+
+    # Repeat "what-if" requests against an unchanged project reuse the last analysis
+    project, panels, feeders, circuits = await asyncio.gather(
+        get_project_data(supabase, project_id),
+        get_all_panels(supabase, project_id),
+        get_all_feeders(supabase, project_id),
+        get_all_circuits(supabase, project_id, columns=IMPACT_KEY_CIRCUIT_COLUMNS)
+    )
+    cache_key = _impact_cache_key(
+        project_id, project, change_description, proposed_loads, capacity_pre_check, panels, feeders, circuits
+    )
+    cached = _impact_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     prompt = f"""
 Analyze the impact of the following change to this electrical system:
 
 **Change Description:** {change_description}
 
 **Proposed Additional Loads:**
-{', '.join([f"{l.get('quantity', 1)}x {l.get('type')} @ {l.get('amps')}A" for l in proposed_loads])}
+{', '.join(load_descriptions)}
 
 **Total Additional Load:** {total_additional_amps}A
 
@@ -344,22 +477,24 @@ Based on your analysis:
 Be SPECIFIC with numbers. Example: "Current 172A + proposed 48A = 220A total, which exceeds 200A service by 20A."
 """
 
-    # Run agent with tools - pass proposed_load_amps for context building
+    # Run agent with tools - pass proposed_load_amps and the pre-check for context building
     result = await change_impact_agent.run(
         prompt,
         deps={
             'supabase': supabase,
             'project_id': project_id,
-            'proposed_load_amps': total_additional_amps
+            'proposed_load_amps': total_additional_amps,
+            'capacity_pre_check': capacity_pre_check
         }
     )
 
     # Safety check: Override AI decision if pre-check says REJECT
     output = result.output
     if capacity_pre_check.get('requires_service_upgrade', False) and output.can_accommodate:
-        logger.warning(f"AI approved change but capacity check says REJECT. Overriding to rejected.")
+        logger.warning("AI approved change but capacity check says REJECT. Overriding to rejected.")
         # Note: We can't easily modify the Pydantic model output here,
         # but the enhanced context should make the AI give the right answer.
         # If this keeps happening, we'd need to wrap the output.
 
+    _impact_cache.set(cache_key, output)
     return output
@@ -0,0 +1,49 @@
+"""
+Shared Gemini model for all agents
+
+Every agent runs on the same model instance so they share one provider and
+HTTP connection pool. `warmup_agents()` opens that pool at startup so the
+first user request does not pay for TLS handshake and client setup.
+"""
+
+from pydantic_ai import Agent
+from pydantic_ai.models import infer_model
+from pydantic_ai.usage import UsageLimits
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL_NAME = 'gemini-2.0-flash-exp'
+
+# Resolved once at import time and passed to every Agent
+gemini_model = infer_model(GEMINI_MODEL_NAME)
+
+# Startup never waits longer than this for the warmup request
+WARMUP_TIMEOUT_SECONDS = 10
+
+# Minimal agent without project context, used only to warm the shared model
+_warmup_agent = Agent(gemini_model, output_type=str)
+
+
+async def warmup_agents() -> None:
+    """
+    Issue a single tiny request through the shared model
+
+    Bounded by WARMUP_TIMEOUT_SECONDS so a slow or unavailable Gemini API cannot
+    hold up startup. Failures and timeouts are logged and ignored; agents still
+    work, the first real request just pays the connection setup instead.
+    """
+    try:
+        await asyncio.wait_for(
+            _warmup_agent.run(
+                'Reply with OK.',
+                usage_limits=UsageLimits(request_limit=1, response_tokens_limit=16)
+            ),
+            timeout=WARMUP_TIMEOUT_SECONDS
+        )
+        logger.info("Gemini model client warmed up")
+    except asyncio.TimeoutError:
+        logger.warning("Agent warmup timed out after %ss", WARMUP_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning("Agent warmup failed: %s", e)
@@ -6,19 +6,131 @@ This is a UNIQUE capability that competitors don't have.
 """
 
 from pydantic_ai import Agent, RunContext, BinaryContent
+from agents.model import gemini_model
 from models.schemas import PhotoAnalysis, NecViolation, Equipment
 from tools.database import get_project_data, get_all_panels
+from tools.cache import TTLCache
 from supabase import Client
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO, Optional, Tuple, Union
 import logging
 from PIL import Image
+import asyncio
+import hashlib
+import httpx
 import io
+import struct
 
 logger = logging.getLogger(__name__)
 
+# Photos larger than this are downscaled and re-encoded before upload to Gemini
+MAX_IMAGE_EDGE_PX = 1568
+MAX_IMAGE_BYTES = 1_500_000
+JPEG_QUALITY = 85
+
+# Upper bound on photos uploaded directly or downloaded from storage URLs
+MAX_PHOTO_BYTES = 25_000_000
+DOWNLOAD_CHUNK_BYTES = 65536
+
+# Analyses of identical photos (e.g. user retries) are reused instead of re-running vision
+_photo_analysis_cache = TTLCache(maxsize=512, ttl=3600)
+
+# Shared HTTP client so storage downloads reuse pooled keep-alive connections
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Get (lazily creating) the shared HTTP client for photo downloads"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (called on application shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Simplified NEC requirements lookup, keyed by equipment type
+_NEC_REQS = {
+    "panel": {
+        "articles": ["408.30", "408.36", "408.40", "110.26"],
+        "key_requirements": [
+            "Max 42 poles per panel (408.36)",
+            "80% max continuous load (408.30)",
+            "Working clearance 3ft min (110.26)",
+            "Proper labeling required (408.4)"
+        ]
+    },
+    "service_entrance": {
+        "articles": ["230.70", "230.79", "230.90", "230.95"],
+        "key_requirements": [
+            "Disconnect must be readily accessible (230.70)",
+            "Rating must match service conductors (230.79)",
+            "Overload protection required (230.90)",
+            "Proper grounding required (250.24)"
+        ]
+    },
+    "transformer": {
+        "articles": ["450.3", "450.4", "450.5"],
+        "key_requirements": [
+            "Overcurrent protection required (450.3)",
+            "Disconnecting means required (450.4)",
+            "Grounding required (450.5)"
+        ]
+    },
+    "grounding": {
+        "articles": ["250.50", "250.52", "250.53", "250.66"],
+        "key_requirements": [
+            "Grounding electrode system required (250.50)",
+            "Proper electrode types (250.52)",
+            "GEC sizing per 250.66",
+            "Bonding jumpers properly sized (250.102)"
+        ]
+    },
+    "conduit": {
+        "articles": ["300.4", "314.16", "352.10"],
+        "key_requirements": [
+            "Protection against physical damage (300.4)",
+            "Proper fill calculations (314.16)",
+            "Proper support and securement (352.30)"
+        ]
+    }
+}
+
+# Common equipment names mapped to their _NEC_REQS key
+_NEC_ALIASES = {
+    "main panel": "panel",
+    "subpanel": "panel",
+    "sub-panel": "panel",
+    "panelboard": "panel",
+    "load center": "panel",
+    "service": "service_entrance",
+    "service entrance": "service_entrance",
+    "service disconnect": "service_entrance",
+    "xfmr": "transformer",
+    "ground": "grounding",
+    "grounding electrode": "grounding",
+    "raceway": "conduit",
+    "emt": "conduit",
+    "pvc": "conduit",
+}
+
+_NO_NEC_REQS = {
+    "articles": [],
+    "key_requirements": ["No specific requirements found for this equipment type"]
+}
+
+
 # Create Pydantic AI agent with multimodal support
 photo_analyzer_agent = Agent(
-    'gemini-2.0-flash-exp',
+    gemini_model,
     output_type=PhotoAnalysis,
     system_prompt="""You are an expert electrical inspector with deep knowledge of the National Electrical Code (NEC).
 
@@ -73,7 +185,9 @@ async def add_project_context(ctx: RunContext[Dict[str, Any]]) -> str:
         return "Project data unavailable."
 
     # Get panels for reference
-    panels = await get_all_panels(supabase, project_id)
+    panels = await get_all_panels(supabase, project_id, columns='name,bus_rating,voltage')
+
+    panel_lines = "\n".join(f"- {p.get('name')}: {p.get('bus_rating', 0)}A, {p.get('voltage', 240)}V" for p in panels[:5]) if panels else "No panels configured"
 
     context = f"""
 ## Project Context
@@ -84,7 +198,7 @@ async def add_project_context(ctx: RunContext[Dict[str, Any]]) -> str:
 **NEC Edition:** {project.get('nec_edition', '2023')}
 
 **Panels in System:**
-{chr(10).join([f"- {p.get('name')}: {p.get('bus_rating', 0)}A, {p.get('voltage', 240)}V" for p in panels[:5]]) if panels else "No panels configured"}
+{panel_lines}
 
 Use this context when analyzing the photo - if you can identify specific equipment, reference it.
 """
@@ -105,69 +219,116 @@ async def get_nec_requirements(
     Returns:
         Relevant NEC requirements
     """
-    # Simplified NEC requirements lookup
-    requirements = {
-        "panel": {
-            "articles": ["408.30", "408.36", "408.40", "110.26"],
-            "key_requirements": [
-                "Max 42 poles per panel (408.36)",
-                "80% max continuous load (408.30)",
-                "Working clearance 3ft min (110.26)",
-                "Proper labeling required (408.4)"
-            ]
-        },
-        "service_entrance": {
-            "articles": ["230.70", "230.79", "230.90", "230.95"],
-            "key_requirements": [
-                "Disconnect must be readily accessible (230.70)",
-                "Rating must match service conductors (230.79)",
-                "Overload protection required (230.90)",
-                "Proper grounding required (250.24)"
-            ]
-        },
-        "transformer": {
-            "articles": ["450.3", "450.4", "450.5"],
-            "key_requirements": [
-                "Overcurrent protection required (450.3)",
-                "Disconnecting means required (450.4)",
-                "Grounding required (450.5)"
-            ]
-        },
-        "grounding": {
-            "articles": ["250.50", "250.52", "250.53", "250.66"],
-            "key_requirements": [
-                "Grounding electrode system required (250.50)",
-                "Proper electrode types (250.52)",
-                "GEC sizing per 250.66",
-                "Bonding jumpers properly sized (250.102)"
-            ]
-        },
-        "conduit": {
-            "articles": ["300.4", "314.16", "352.10"],
-            "key_requirements": [
-                "Protection against physical damage (300.4)",
-                "Proper fill calculations (314.16)",
-                "Proper support and securement (352.30)"
-            ]
-        }
-    }
+    equipment_lower = equipment_type.lower().strip()
+
+    reqs = _NEC_REQS.get(_NEC_ALIASES.get(equipment_lower, equipment_lower))
+    if reqs:
+        return reqs
 
-    equipment_lower = equipment_type.lower()
+    return next(
+        (reqs for key, reqs in _NEC_REQS.items() if key in equipment_lower),
+        _NO_NEC_REQS
+    )
 
-    for key, reqs in requirements.items():
-        if key in equipment_lower:
-            return reqs
 
-    return {
-        "articles": [],
-        "key_requirements": ["No specific requirements found for this equipment type"]
-    }
+def _image_digest(image_file: BinaryIO) -> str:
+    """Content hash of an image buffer (leaves the buffer rewound)"""
+    digest = hashlib.blake2b(digest_size=16)
+    image_file.seek(0)
+    for chunk in iter(lambda: image_file.read(DOWNLOAD_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    image_file.seek(0)
+    return digest.hexdigest()
+
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_JPEG_SOF_MARKERS = frozenset({0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF})
+_HEADER_MEDIA_TYPES = {'PNG': 'image/png', 'JPEG': 'image/jpeg'}
+
+
+def _read_image_header(image_file: BinaryIO) -> Optional[Tuple[int, int, str]]:
+    """
+    Read (width, height, format) from PNG/JPEG headers without invoking PIL
+
+    Returns None for other formats or malformed headers (leaves the buffer rewound)
+    """
+    try:
+        head = image_file.read(24)
+        if head[:8] == _PNG_SIGNATURE and head[12:16] == b'IHDR':
+            width, height = struct.unpack('>II', head[16:24])
+            return width, height, 'PNG'
+
+        if head[:2] != b'\xff\xd8':
+            return None
+
+        # Walk JPEG segments until the start-of-frame marker carrying the dimensions
+        image_file.seek(2)
+        while True:
+            marker = image_file.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            code = marker[1]
+            while code == 0xFF:  # Fill bytes
+                fill = image_file.read(1)
+                if not fill:
+                    return None
+                code = fill[0]
+            if code == 0x01 or 0xD0 <= code <= 0xD7:  # Standalone markers
+                continue
+            if code == 0xDA:  # Start of scan - no frame header found
+                return None
+
+            segment_length = image_file.read(2)
+            if len(segment_length) < 2:
+                return None
+            (length,) = struct.unpack('>H', segment_length)
+
+            if code in _JPEG_SOF_MARKERS:
+                frame = image_file.read(5)
+                if len(frame) < 5:
+                    return None
+                height, width = struct.unpack('>HH', frame[1:5])
+                return width, height, 'JPEG'
+
+            image_file.seek(length - 2, io.SEEK_CUR)
+    finally:
+        image_file.seek(0)
+
+
+def _downscale_image(img: Image.Image) -> bytes:
+    """Shrink an image to MAX_IMAGE_EDGE_PX on its long edge and re-encode as JPEG"""
+    img.thumbnail((MAX_IMAGE_EDGE_PX, MAX_IMAGE_EDGE_PX), Image.LANCZOS)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def _prepare_image(image_file: BinaryIO, image_size: int) -> Tuple[Optional[bytes], int, int, str, str]:
+    """
+    Read dimensions/format with PIL and downscale the image if it is too large
+
+    Returns:
+        (re-encoded JPEG bytes or None if unchanged, width, height, format, media type)
+    """
+    img = Image.open(image_file)
+    width, height = img.size
+    format_str = img.format or "Unknown"
+    media_type = Image.MIME.get(img.format, 'image/png')
+
+    # Large phone photos inflate upload size and vision tokens - send a smaller JPEG
+    if max(width, height) > MAX_IMAGE_EDGE_PX or image_size > MAX_IMAGE_BYTES:
+        return _downscale_image(img), width, height, format_str, 'image/jpeg'
+
+    return None, width, height, format_str, media_type
 
 
 async def analyze_photo(
     supabase: Client,
     project_id: str,
-    image_data: bytes,
+    image_data: Union[bytes, BinaryIO],
     description: str = ""
 ) -> PhotoAnalysis:
     """
@@ -176,20 +337,48 @@ async def analyze_photo(
     Args:
         supabase: Supabase client
         project_id: Project UUID
-        image_data: Photo bytes (JPEG, PNG, etc.)
+        image_data: Photo bytes or seekable binary file, e.g. an upload's spooled
+            temp file (JPEG, PNG, etc.)
         description: Optional context about what the photo shows
 
     Returns:
         Complete photo analysis with violations and recommendations
     """
-    # Load image with PIL to get dimensions and format
-    try:
-        img = Image.open(io.BytesIO(image_data))
-        width, height = img.size
-        format_str = img.format or "Unknown"
-    except Exception as e:
-        logger.error(f"Error loading image: {e}")
-        width, height, format_str = 0, 0, "Unknown"
+    # Buffers (e.g. streamed downloads) are handed to PIL directly without a copy
+    image_file = io.BytesIO(image_data) if isinstance(image_data, (bytes, bytearray)) else image_data
+    image_size = image_file.seek(0, io.SEEK_END)
+    image_file.seek(0)
+
+    # Hashing up to MAX_PHOTO_BYTES of a spooled temp file blocks - keep it off the event loop
+    cache_key = (project_id, await asyncio.to_thread(_image_digest, image_file), description)
+    cached = _photo_analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    media_type = 'image/png'
+    image_bytes = None
+    header = _read_image_header(image_file)
+
+    if header and max(header[0], header[1]) <= MAX_IMAGE_EDGE_PX and image_size <= MAX_IMAGE_BYTES:
+        # Small PNG/JPEG - dimensions come from the headers, PIL is not needed
+        width, height, format_str = header
+        media_type = _HEADER_MEDIA_TYPES[format_str]
+    else:
+        # PIL decode/resize is CPU-bound - keep it off the event loop
+        try:
+            image_bytes, width, height, format_str, media_type = await asyncio.to_thread(
+                _prepare_image, image_file, image_size
+            )
+        except Exception as e:
+            logger.error("Error loading image: %s", e)
+            width, height, format_str = 0, 0, "Unknown"
+
+    if image_bytes is None:
+        if isinstance(image_data, (bytes, bytearray)):
+            image_bytes = image_data
+        else:
+            image_file.seek(0)
+            image_bytes = image_file.read()
 
     prompt = f"""
 Analyze this electrical installation photo and provide a detailed inspection report.
@@ -215,11 +404,12 @@ If the photo quality is poor or equipment is not clearly visible, note this in y
     result = await photo_analyzer_agent.run(
         [
             prompt,
-            BinaryContent(data=image_data, media_type='image/png')
+            BinaryContent(data=image_bytes, media_type=media_type)
         ],
         deps={'supabase': supabase, 'project_id': project_id}
     )
 
+    _photo_analysis_cache.set(cache_key, result.output)
     return result.output
 
 
@@ -241,14 +431,16 @@ async def analyze_photo_from_url(
     Returns:
         Photo analysis
     """
-    import httpx
-
-    # Download image from Supabase Storage
-    async with httpx.AsyncClient() as client:
-        response = await client.get(image_url)
+    # Stream image from Supabase Storage into a single bounded buffer
+    image_buffer = io.BytesIO()
+    async with _get_http_client().stream('GET', image_url) as response:
         if response.status_code != 200:
             raise Exception(f"Failed to download image: {response.status_code}")
 
-        image_data = response.content
+        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_BYTES):
+            if image_buffer.tell() + len(chunk) > MAX_PHOTO_BYTES:
+                raise Exception(f"Image exceeds {MAX_PHOTO_BYTES} byte download limit")
+            image_buffer.write(chunk)
 
-    return await analyze_photo(supabase, project_id, image_data, description)
+    image_buffer.seek(0)
+    return await analyze_photo(supabase, project_id, image_buffer, description)
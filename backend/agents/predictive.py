@@ -6,25 +6,38 @@ Analyzes all aspects of the electrical system to identify high-risk issues befor
 """
 
 from pydantic_ai import Agent, RunContext
+from agents.model import gemini_model
 from models.schemas import InspectionPrediction, PredictedIssue
 from tools.database import (
-    get_project_data,
     get_all_panels,
     get_all_feeders,
-    get_all_issues,
     get_service_utilization,
-    get_grounding_system,
-    get_panel_circuits
+    get_circuits_for_panels,
+    get_project_bundle,
+    build_panel_name_index,
+    SQRT3
 )
+from tools.cache import run_cached, prime_cached
 from supabase import Client
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
+# Columns read by the system prompt and tools; the prompt and tools request the
+# same projections so they share cached rows within a run
+PANEL_COLUMNS = 'id,name,bus_rating,voltage,phase'
+FEEDER_COLUMNS = 'name,phase_conductor_size,conductor_material,distance_ft,voltage_drop_percent'
+CIRCUIT_COLUMNS = 'panel_id,load_watts'
+
+# Voltage drop limits (percent)
+FEEDER_VDROP_LIMIT_PERCENT = 3.0
+TOTAL_VDROP_LIMIT_PERCENT = 5.0
+
 # Create Pydantic AI agent
 predictive_inspector_agent = Agent(
-    'gemini-2.0-flash-exp',
+    gemini_model,
     output_type=InspectionPrediction,
     system_prompt="""You are a seasoned electrical inspector with 20+ years of experience conducting NEC compliance inspections.
 
@@ -60,30 +73,31 @@ async def add_project_context(ctx: RunContext[Dict[str, Any]]) -> str:
     Build comprehensive project context for analysis
 
     Args:
-        ctx: Run context with supabase client and project_id
+        ctx: Run context with supabase client, project_id and the per-run query cache
 
     Returns:
         Detailed project state
     """
-    supabase: Client = ctx.deps['supabase']
     project_id: str = ctx.deps['project_id']
 
-    # Fetch all project data
-    project = await get_project_data(supabase, project_id)
-    panels = await get_all_panels(supabase, project_id)
-    feeders = await get_all_feeders(supabase, project_id)
-    issues = await get_all_issues(supabase, project_id)
-    service_util = await get_service_utilization(supabase, project_id)
-    grounding = await get_grounding_system(supabase, project_id)
-
-    if not project:
+    # Whole snapshot in one round trip (assembled from table queries if the
+    # bundle function is not deployed)
+    bundle = await get_project_bundle(ctx.deps['supabase'], project_id)
+    if bundle is None:
         return "Project data unavailable."
 
-    # Calculate panel circuit counts
-    panel_circuit_counts = {}
-    for panel in panels:
-        circuits = await get_panel_circuits(supabase, panel['id'])
-        panel_circuit_counts[panel['name']] = len(circuits)
+    project = bundle['project']
+    panels, feeders, issues, grounding = bundle['panels'], bundle['feeders'], bundle['issues'], bundle['grounding']
+    service_util = bundle.get('service_utilization') or await run_cached(ctx.deps, get_service_utilization, project_id)
+    panel_circuit_counts = {p['name']: p['circuit_count'] for p in panels}
+
+    # Tools in this run reuse the bundled rows
+    prime_cached(ctx.deps, panels, get_all_panels, project_id, PANEL_COLUMNS)
+    prime_cached(ctx.deps, feeders, get_all_feeders, project_id, FEEDER_COLUMNS)
+
+    panel_lines = "\n".join(f"- {p.get('name')}: {p.get('bus_rating', 0)}A panel, {panel_circuit_counts.get(p.get('name'), 0)} circuits" for p in panels) if panels else "No panels configured"
+    feeder_lines = "\n".join(f"- {f['name']}: {f['phase_conductor_size']} {f['conductor_material'] or 'Cu'}, {f['distance_ft'] or 0}ft, {f['voltage_drop_percent'] or 0:.2f}% Vdrop" for f in feeders[:5]) if feeders else "No feeders configured"
+    issue_lines = "\n".join(f"- [{i.get('severity', 'Unknown')}] {i.get('description', 'No description')[:60]}..." for i in issues[:5]) if issues else "No open issues"
 
     context = f"""
 ## Project Snapshot
@@ -97,23 +111,47 @@ async def add_project_context(ctx: RunContext[Dict[str, Any]]) -> str:
 - **Utilization:** {service_util.get('utilization_percent', 0):.1f}% ({service_util.get('total_load_va', 0):.0f} VA / {service_util.get('service_capacity_va', 0):.0f} VA)
 
 ### Panels ({len(panels)})
-{chr(10).join([f"- {p.get('name')}: {p.get('bus_rating', 0)}A panel, {panel_circuit_counts.get(p.get('name'), 0)} circuits" for p in panels]) if panels else "No panels configured"}
+{panel_lines}
 
 ### Feeders ({len(feeders)})
-{chr(10).join([f"- {f.get('name')}: {f.get('conductor_size')} {f.get('conductor_material', 'Cu')}, {f.get('length_feet', 0)}ft, {f.get('voltage_drop_percent', 0):.2f}% Vdrop" for f in feeders[:5]]) if feeders else "No feeders configured"}
+{feeder_lines}
 
 ### Grounding System
 - **GEC:** {grounding.get('grounding_electrode_conductor', 'Not specified') if grounding else 'Not configured'}
 - **Electrode Type:** {grounding.get('grounding_electrode_type', 'Not specified') if grounding else 'Not configured'}
 
 ### Open Issues ({len(issues)})
-{chr(10).join([f"- [{i.get('severity', 'Unknown')}] {i.get('description', 'No description')[:60]}..." for i in issues[:5]]) if issues else "No open issues"}
+{issue_lines}
 
 Analyze this complete system for potential inspection failures.
 """
     return context
 
 
+def _panel_load_stats(
+    circuits: List[Dict[str, Any]],
+    bus_rating: float,
+    voltage: float,
+    phases: int
+) -> Tuple[float, float]:
+    """
+    Compute a panel's connected load and bus utilization
+
+    Args:
+        circuits: Circuit rows on the panel (load_watts)
+        bus_rating: Bus rating in amps
+        voltage: Panel voltage
+        phases: 1 or 3
+
+    Returns:
+        Tuple of (total load in VA, utilization percent)
+    """
+    total_load_va = math.fsum(c['load_watts'] or 0 for c in circuits)
+    capacity_va = bus_rating * voltage * (SQRT3 if phases == 3 else 1.0)
+    utilization = (total_load_va / capacity_va * 100) if capacity_va > 0 else 0
+    return total_load_va, utilization
+
+
 @predictive_inspector_agent.tool
 async def check_panel_compliance(
     ctx: RunContext[Dict[str, Any]],
@@ -128,33 +166,31 @@ async def check_panel_compliance(
     Returns:
         Compliance status and violations
     """
-    supabase: Client = ctx.deps['supabase']
     project_id: str = ctx.deps['project_id']
 
-    panels = await get_all_panels(supabase, project_id)
-    panel = next((p for p in panels if p.get('name', '').lower() == panel_name.lower()), None)
+    # Panels and circuits were already loaded for the system prompt in this run
+    panels = await run_cached(ctx.deps, get_all_panels, project_id, PANEL_COLUMNS)
+    panels_by_name = ctx.deps.get('panels_by_name')
+    if panels_by_name is None:
+        panels_by_name = build_panel_name_index(panels)
+        ctx.deps['panels_by_name'] = panels_by_name
+
+    panel = panels_by_name.get(panel_name.casefold())
 
     if not panel:
         return {"error": f"Panel '{panel_name}' not found"}
 
     # Get circuits
-    circuits = await get_panel_circuits(supabase, panel['id'])
+    circuits_by_panel = await run_cached(ctx.deps, get_circuits_for_panels, tuple(p['id'] for p in panels), CIRCUIT_COLUMNS)
+    circuits = circuits_by_panel.get(panel['id'], [])
     circuit_count = len(circuits)
 
-    # Calculate total load
-    total_load_va = sum(c.get('load_va', 0) for c in circuits)
-
     # Get panel capacity
-    bus_rating = panel.get('bus_rating', 200)
-    voltage = panel.get('voltage', 240)
-    phases = panel.get('phases', 1)
+    bus_rating = panel.get('bus_rating') or 200
+    voltage = panel.get('voltage') or 240
+    phases = panel.get('phase') or panel.get('phases') or 1
 
-    if phases == 3:
-        capacity_va = bus_rating * voltage * 1.732
-    else:
-        capacity_va = bus_rating * voltage
-
-    utilization = (total_load_va / capacity_va * 100) if capacity_va > 0 else 0
+    _, utilization = _panel_load_stats(circuits, bus_rating, voltage, phases)
 
     # Check violations
     violations = []
@@ -185,28 +221,20 @@ async def check_voltage_drop_compliance(ctx: RunContext[Dict[str, Any]]) -> List
     Returns:
         List of voltage drop violations
     """
-    supabase: Client = ctx.deps['supabase']
     project_id: str = ctx.deps['project_id']
 
-    feeders = await get_all_feeders(supabase, project_id)
-
-    violations = []
-
-    for feeder in feeders:
-        vdrop = feeder.get('voltage_drop_percent', 0)
-
-        # NEC 210.19(A) - 3% branch circuits, 5% total
-        # NEC 215.2(A)(1) - Feeder to panel
-        if vdrop > 3:  # Feeder limit
-            violations.append({
-                "feeder": feeder.get('name', 'Unknown'),
-                "voltage_drop": vdrop,
-                "limit": 3.0,
-                "article": "NEC 210.19(A) / 215.2(A)(1)",
-                "severity": "High" if vdrop > 5 else "Medium"
-            })
+    feeders = await run_cached(ctx.deps, get_all_feeders, project_id, FEEDER_COLUMNS)
 
-    return violations
+    # NEC 210.19(A) - 3% branch circuits, 5% total
+    # NEC 215.2(A)(1) - Feeder to panel
+    return [{
+        "feeder": feeder['name'] or 'Unknown',
+        "voltage_drop": vdrop,
+        "limit": FEEDER_VDROP_LIMIT_PERCENT,
+        "article": "NEC 210.19(A) / 215.2(A)(1)",
+        "severity": "High" if vdrop > TOTAL_VDROP_LIMIT_PERCENT else "Medium"
+    } for feeder in feeders
+        if (vdrop := feeder['voltage_drop_percent'] or 0) > FEEDER_VDROP_LIMIT_PERCENT]
 
 
 async def predict_inspection(
@@ -254,7 +282,7 @@ Provide a preparation checklist with specific tasks to complete before inspectio
     # Run agent with tools
     result = await predictive_inspector_agent.run(
         prompt,
-        deps={'supabase': supabase, 'project_id': project_id}
+        deps={'supabase': supabase, 'project_id': project_id, 'cache': {}}
     )
 
     return result.output
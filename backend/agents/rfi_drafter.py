@@ -6,22 +6,43 @@ Helps contractors quickly create professional RFI submissions.
 """
 
 from pydantic_ai import Agent, RunContext
+from agents.model import gemini_model
 from models.schemas import RFIDraft
 from tools.database import (
-    get_project_data,
-    get_recent_rfis,
-    get_all_issues,
-    get_all_panels
+    get_all_panels,
+    get_project_bundle,
+    build_panel_name_index
 )
 from supabase import Client
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Columns returned by the get_panel_info tool
+PANEL_INFO_COLUMNS = 'name,bus_rating,voltage,phase,main_breaker_amps,is_main,location'
+
+# Simplified NEC article lookup (scanned in order; the first matching key wins)
+_NEC_REFERENCES: Dict[str, Tuple[str, ...]] = {
+    "grounding": ("250.50", "250.52", "250.53", "250.66"),
+    "bonding": ("250.92", "250.94", "250.96"),
+    "panel": ("408.30", "408.36", "408.40"),
+    "panel sizing": ("408.30", "408.36"),
+    "service": ("230.42", "230.79", "230.90"),
+    "feeder": ("215.2", "215.3", "215.10"),
+    "voltage drop": ("210.19(A)", "215.2(A)(1)"),
+    "conductor sizing": ("310.16", "240.4(D)"),
+    "egc": ("250.122", "250.118"),
+    "grounding electrode": ("250.50", "250.52", "250.53"),
+    "transformer": ("450.3", "450.4", "450.5"),
+    "ev charging": ("625.40", "625.42", "625.44"),
+    "solar": ("690.8", "690.12", "690.15"),
+    "emergency": ("700.12", "700.16", "700.27"),
+}
+
 # Create Pydantic AI agent
 rfi_drafter_agent = Agent(
-    'gemini-2.0-flash-exp',
+    gemini_model,
     output_type=RFIDraft,
     system_prompt="""You are a professional electrical project coordinator specializing in RFI (Request for Information) documentation.
 
@@ -62,16 +83,17 @@ async def add_project_context(ctx: RunContext[Dict[str, Any]]) -> str:
     supabase: Client = ctx.deps['supabase']
     project_id: str = ctx.deps['project_id']
 
-    # Fetch project data
-    project = await get_project_data(supabase, project_id)
-    if not project:
+    # Whole snapshot in one round trip (assembled from table queries if the
+    # bundle function is not deployed)
+    bundle = await get_project_bundle(supabase, project_id)
+    if bundle is None:
         return "Project data unavailable."
 
-    # Get recent RFIs for context
-    recent_rfis = await get_recent_rfis(supabase, project_id, limit=3)
+    project = bundle['project']
+    recent_rfis, issues = bundle['rfis'][:3], bundle['issues']
 
-    # Get open issues
-    issues = await get_all_issues(supabase, project_id)
+    rfi_lines = "\n".join(f"- {rfi.get('subject', 'No subject')} (Status: {rfi.get('status', 'Unknown')})" for rfi in recent_rfis) if recent_rfis else "No recent RFIs"
+    issue_lines = "\n".join(f"- {issue.get('description', 'No description')[:60]}..." for issue in issues[:3]) if issues else "No open issues"
 
     context = f"""
 ## Current Project Context
@@ -82,10 +104,10 @@ async def add_project_context(ctx: RunContext[Dict[str, Any]]) -> str:
 **Status:** Active
 
 **Recent RFIs ({len(recent_rfis)}):**
-{chr(10).join([f"- {rfi.get('subject', 'No subject')} (Status: {rfi.get('status', 'Unknown')})" for rfi in recent_rfis]) if recent_rfis else "No recent RFIs"}
+{rfi_lines}
 
 **Open Issues ({len(issues)}):**
-{chr(10).join([f"- {issue.get('description', 'No description')[:60]}..." for issue in issues[:3]]) if issues else "No open issues"}
+{issue_lines}
 
 Use this context to ensure the RFI is relevant and doesn't duplicate recent questions.
 """
@@ -106,21 +128,24 @@ async def get_panel_info(ctx: RunContext[Dict[str, Any]], panel_name: str) -> Di
     supabase: Client = ctx.deps['supabase']
     project_id: str = ctx.deps['project_id']
 
-    panels = await get_all_panels(supabase, project_id)
+    # Find matching panel - the name index is built once per run
+    panels_by_name = ctx.deps.get('panels_by_name')
+    if panels_by_name is None:
+        panels_by_name = build_panel_name_index(await get_all_panels(supabase, project_id, columns=PANEL_INFO_COLUMNS))
+        ctx.deps['panels_by_name'] = panels_by_name
 
-    # Find matching panel
-    panel = next((p for p in panels if p.get('name', '').lower() == panel_name.lower()), None)
+    panel = panels_by_name.get(panel_name.casefold())
 
     if not panel:
         return {"error": f"Panel '{panel_name}' not found"}
 
     return {
         "name": panel.get('name'),
-        "type": panel.get('panel_type'),
+        "type": "Main" if panel.get('is_main') else "Subpanel",
         "rating": f"{panel.get('bus_rating', 0)}A",
         "voltage": f"{panel.get('voltage', 240)}V",
-        "phases": panel.get('phases', 1),
-        "main_breaker": f"{panel.get('main_breaker_rating', 0)}A",
+        "phases": panel.get('phase', 1),
+        "main_breaker": f"{panel.get('main_breaker_amps') or 0}A",
         "location": panel.get('location', 'Not specified')
     }
 
@@ -136,30 +161,12 @@ async def lookup_nec_article(ctx: RunContext[Dict[str, Any]], topic: str) -> Lis
     Returns:
         List of relevant NEC article numbers
     """
-    # Simplified NEC article lookup
-    nec_references = {
-        "grounding": ["250.50", "250.52", "250.53", "250.66"],
-        "bonding": ["250.92", "250.94", "250.96"],
-        "panel": ["408.30", "408.36", "408.40"],
-        "panel sizing": ["408.30", "408.36"],
-        "service": ["230.42", "230.79", "230.90"],
-        "feeder": ["215.2", "215.3", "215.10"],
-        "voltage drop": ["210.19(A)", "215.2(A)(1)"],
-        "conductor sizing": ["310.16", "240.4(D)"],
-        "egc": ["250.122", "250.118"],
-        "grounding electrode": ["250.50", "250.52", "250.53"],
-        "transformer": ["450.3", "450.4", "450.5"],
-        "ev charging": ["625.40", "625.42", "625.44"],
-        "solar": ["690.8", "690.12", "690.15"],
-        "emergency": ["700.12", "700.16", "700.27"],
-    }
-
     topic_lower = topic.lower()
 
-    # Find matching articles
-    for key, articles in nec_references.items():
+    # First key (in table order) contained in the topic wins
+    for key, articles in _NEC_REFERENCES.items():
         if key in topic_lower:
-            return articles
+            return list(articles)
 
     return []
 
@@ -1,11 +1,8 @@
-from pydantic_settings import BaseSettings
-from typing import List
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import List, Optional
+from functools import lru_cache
 from dotenv import load_dotenv
 
-# Load .env file into os.environ BEFORE Settings is created
-# This ensures GOOGLE_API_KEY is available when Pydantic AI agents are initialized
-load_dotenv()
-
 
 class Settings(BaseSettings):
     """Application configuration"""
@@ -13,6 +10,8 @@ class Settings(BaseSettings):
     # Supabase
     supabase_url: str
     supabase_service_key: str
+    # Optional direct Postgres connection for hot reads (bypasses PostgREST)
+    database_url: Optional[str] = None
 
     # Google Gemini AI (Pydantic AI uses GOOGLE_API_KEY)
     google_api_key: str
@@ -22,13 +21,32 @@ class Settings(BaseSettings):
     port: int = 8000
     allowed_origins: List[str] = ["http://localhost:3000"]
 
+    # Agents
+    # Return a deterministic result instead of calling the LLM when the
+    # change impact capacity pre-check verdict is REJECT
+    skip_llm_on_reject: bool = True
+    # Send one tiny Gemini request at startup to open the shared client
+    agent_warmup: bool = True
+
     # Logging
     log_level: str = "INFO"
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, frozen=True)
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Load settings once per process
+
+    Returns:
+        Settings: Parsed, read-only application settings
+    """
+    # Load .env file into os.environ BEFORE Settings is created
+    # This ensures GOOGLE_API_KEY is available when Pydantic AI agents are initialized
+    load_dotenv()
+    return Settings()
 
 
 # Global settings instance
-settings = Settings()
+settings = get_settings()
@@ -1,7 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from config import settings
 import logging
+import sys
 
 # Configure logging
 logging.basicConfig(
@@ -14,7 +16,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="SparkPlan - AI Agent API",
     description="Pydantic AI-powered agent orchestration for electrical project management",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -55,6 +58,32 @@ from routes import agent_actions
 app.include_router(agent_actions.router, prefix="/api", tags=["agent-actions"])
 
 
+@app.on_event("startup")
+async def startup():
+    """Open the Postgres pool and the shared Gemini client before the first request"""
+    from tools.db_pool import init_pool
+    await init_pool()
+
+    if settings.agent_warmup:
+        from agents.model import warmup_agents
+        await warmup_agents()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close shared HTTP and database connection pools"""
+    from middleware.auth import close_supabase_client
+    close_supabase_client()
+
+    from tools.db_pool import close_pool
+    await close_pool()
+
+    # Agents load lazily; only close the photo download client if it was used
+    photo_analyzer = sys.modules.get('agents.photo_analyzer')
+    if photo_analyzer is not None:
+        await photo_analyzer.close_http_client()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
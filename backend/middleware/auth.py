@@ -1,22 +1,117 @@
-from fastapi import HTTPException, Security
+from fastapi import HTTPException, Request, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from config import settings
+from tools.cache import TTLCache
+from typing import Any
+import asyncio
+import base64
+import hashlib
+import httpx
+import json
 import logging
+import orjson
+import time
 
 logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+
+class _OrjsonResponse(httpx.Response):
+    """httpx response that decodes JSON bodies with orjson"""
+
+    def json(self, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().json(**kwargs)
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers'
+        # error handling is unchanged
+        return orjson.loads(self.content)
+
+
+class _OrjsonTransport(httpx.BaseTransport):
+    """Wrap a transport so every response parses JSON with orjson"""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = self._transport.handle_request(request)
+        return _OrjsonResponse(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=response.stream,
+            extensions=response.extensions
+        )
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+# One pooled HTTP/2 connection shared by PostgREST, auth and storage requests,
+# so concurrent queries reuse the same TLS session. Responses are decoded with
+# orjson (supabase-py parses every body through Response.json()).
+_supabase_http_client = httpx.Client(
+    transport=_OrjsonTransport(httpx.HTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+    )),
+    timeout=httpx.Timeout(60.0),
+    follow_redirects=True
+)
+
+# Validated users keyed by token digest; entries never outlive the token itself.
+# Trade-off: a token revoked by sign-out is still accepted until its entry
+# expires, so keep this short.
+AUTH_CACHE_TTL_SECONDS = 15
+_auth_cache = TTLCache(maxsize=4096, ttl=AUTH_CACHE_TTL_SECONDS)
+
 # Initialize Supabase client
-supabase: Client = create_client(settings.supabase_url, settings.supabase_service_key)
+supabase: Client = create_client(
+    settings.supabase_url,
+    settings.supabase_service_key,
+    options=ClientOptions(httpx_client=_supabase_http_client)
+)
+
+
+def _token_cache_ttl(token: str) -> float:
+    """
+    Seconds a validated token may be served from cache
 
+    Capped by the token's `exp` claim so an expired token is never accepted.
+    The claim is only read here; the signature was verified by Supabase.
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
+    Args:
+        token: JWT access token
+
+    Returns:
+        Cache TTL in seconds (0 if the expiry cannot be determined)
+    """
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return min(AUTH_CACHE_TTL_SECONDS, float(claims['exp']) - time.time())
+    except (IndexError, KeyError, TypeError, ValueError):
+        return 0
+
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Security(security)
+) -> dict:
     """
     Validate Supabase JWT token and return user info
 
+    The result is stored on `request.state.user`, so any further resolution
+    within the same request (e.g. from a sub-dependency declared with a
+    different signature) skips validation.
+
+    Validated tokens are also cached for up to AUTH_CACHE_TTL_SECONDS (never
+    past the token's exp). A token revoked by sign-out keeps being accepted
+    until its cache entry expires.
+
     Args:
+        request: Incoming request (holds the per-request user)
         credentials: HTTP Authorization credentials with JWT token
 
     Returns:
@@ -25,12 +120,24 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(
     Raises:
         HTTPException: If token is invalid or expired
     """
+    request_user = getattr(request.state, 'user', None)
+    if request_user is not None:
+        return request_user
+
     token = credentials.credentials
 
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached_user = _auth_cache.get(cache_key)
+    if cached_user is not None:
+        logger.debug("User authenticated (cached)")
+        request.state.user = cached_user
+        return cached_user
+
     try:
         # Verify JWT token with Supabase. Do not log token contents or full auth
         # responses; they can contain sensitive user metadata.
-        response = supabase.auth.get_user(token)
+        # supabase-py is synchronous; run the round trip off the event loop
+        response = await asyncio.to_thread(supabase.auth.get_user, token)
 
         if not response or not response.user:
             logger.error("No user in auth response")
@@ -40,18 +147,25 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(
             )
 
         user = response.user
-        logger.info("User authenticated")
+        logger.debug("User authenticated")
 
-        return {
+        user_info = {
             "id": user.id,
             "email": user.email,
             "user_metadata": user.user_metadata
         }
 
+        ttl = _token_cache_ttl(token)
+        if ttl > 0:
+            _auth_cache.set(cache_key, user_info, ttl=ttl)
+
+        request.state.user = user_info
+        return user_info
+
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Authentication error: {type(e).__name__}: {str(e)}")
+        logger.error("Authentication error: %s: %s", type(e).__name__, e)
         raise HTTPException(
             status_code=401,
             detail="Could not validate credentials"
@@ -66,3 +180,8 @@ def get_supabase_client() -> Client:
         Client: Supabase client
     """
     return supabase
+
+
+def close_supabase_client() -> None:
+    """Close the pooled Supabase HTTP connections"""
+    _supabase_http_client.close()
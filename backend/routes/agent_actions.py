@@ -4,7 +4,7 @@ API Routes for Agent Actions
 RESTful endpoints for triggering AI agents and managing agent suggestions.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Response
 from middleware.auth import get_current_user, get_supabase_client
 from models.schemas import (
     AgentActionCreate,
@@ -18,26 +18,28 @@ from models.schemas import (
     AnalyzePhotoRequest,
     PredictInspectionRequest
 )
-from agents.change_impact import analyze_change_impact
-from agents.rfi_drafter import draft_rfi
-from agents.photo_analyzer import analyze_photo
-from agents.predictive import predict_inspection
+# Agent modules are imported inside their handlers so startup does not
+# construct every agent up front
 from supabase import Client
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime
+from types import MappingProxyType
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Queue priority (0-100) for agent-reported priority / severity levels
+_RFI_PRIORITY = MappingProxyType({"Urgent": 90, "High": 70, "Medium": 50, "Low": 30})
+_PHOTO_PRIORITY = MappingProxyType({"Critical": 95, "Warning": 70, "Info": 40})
+
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-async def queue_agent_action(
-    supabase: Client,
+def build_agent_action_row(
     user_id: str,
     project_id: str,
     action_type: str,
@@ -49,12 +51,11 @@ async def queue_agent_action(
     confidence: float = None,
     impact_analysis: dict = None,
     priority: int = 50
-) -> AgentActionResponse:
+) -> Dict[str, Any]:
     """
-    Queue an agent action in the database for user approval
+    Build a pending agent_actions row
 
     Args:
-        supabase: Supabase client
         user_id: User UUID
         project_id: Project UUID
         action_type: Type of action
@@ -68,32 +69,96 @@ async def queue_agent_action(
         priority: 0-100 priority
 
     Returns:
-        Created agent action
+        Row dict ready for insert (status and expires_at come from the
+        column defaults: 'pending', 72 hours after insert)
     """
-    expires_at = datetime.utcnow() + timedelta(hours=72)
-
-    data = {
+    return {
         "project_id": project_id,
         "user_id": user_id,
         "action_type": action_type,
         "agent_name": agent_name,
         "priority": priority,
-        "status": "pending",
         "title": title,
         "description": description,
         "reasoning": reasoning,
         "confidence_score": confidence,
         "action_data": action_data,
-        "impact_analysis": impact_analysis,
-        "expires_at": expires_at.isoformat()
+        "impact_analysis": impact_analysis
     }
 
-    response = supabase.table('agent_actions').insert(data).execute()
 
-    if not response.data:
+async def queue_agent_actions_bulk(
+    supabase: Client,
+    rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Queue several agent actions with a single insert
+
+    Args:
+        supabase: Supabase client
+        rows: Rows from build_agent_action_row
+
+    Returns:
+        Created agent actions, in insert order
+    """
+    response = supabase.table('agent_actions').insert(rows).execute()
+
+    if not response.data or len(response.data) != len(rows):
         raise HTTPException(status_code=500, detail="Failed to queue agent action")
 
-    return AgentActionResponse(**response.data[0])
+    # Raw rows: the endpoints' response_model validates them once on the way out
+    return response.data
+
+
+async def queue_agent_action(
+    supabase: Client,
+    user_id: str,
+    project_id: str,
+    action_type: str,
+    agent_name: str,
+    title: str,
+    description: str,
+    action_data: dict,
+    reasoning: str = None,
+    confidence: float = None,
+    impact_analysis: dict = None,
+    priority: int = 50
+) -> Dict[str, Any]:
+    """
+    Queue an agent action in the database for user approval
+
+    Args:
+        supabase: Supabase client
+        user_id: User UUID
+        project_id: Project UUID
+        action_type: Type of action
+        agent_name: Which agent generated this
+        title: Short title
+        description: Detailed description
+        action_data: The actual data (RFI draft, impact analysis, etc.)
+        reasoning: Why the agent suggests this
+        confidence: AI confidence score (0.0-1.0)
+        impact_analysis: Optional impact analysis
+        priority: 0-100 priority
+
+    Returns:
+        Created agent action
+    """
+    row = build_agent_action_row(
+        user_id=user_id,
+        project_id=project_id,
+        action_type=action_type,
+        agent_name=agent_name,
+        title=title,
+        description=description,
+        action_data=action_data,
+        reasoning=reasoning,
+        confidence=confidence,
+        impact_analysis=impact_analysis,
+        priority=priority
+    )
+    actions = await queue_agent_actions_bulk(supabase, [row])
+    return actions[0]
 
 
 async def assert_project_access(
@@ -134,6 +199,8 @@ async def trigger_change_impact_analysis(
     Returns:
         Agent action queued for approval
     """
+    from agents.change_impact import analyze_change_impact
+
     try:
         await assert_project_access(supabase, user['id'], request.project_id)
 
@@ -148,6 +215,9 @@ async def trigger_change_impact_analysis(
             proposed_loads=proposed_loads_dict
         )
 
+        # The analysis is stored as both the action payload and its impact analysis
+        impact_dict = impact.model_dump()
+
         # Queue for user approval
         action = await queue_agent_action(
             supabase=supabase,
@@ -157,10 +227,10 @@ async def trigger_change_impact_analysis(
             agent_name="change_impact",
             title=f"Impact Analysis: {request.change_description}",
             description=impact.impact_summary,
-            action_data=impact.model_dump(),
+            action_data=impact_dict,
             reasoning=f"Analyzed impact of: {request.change_description}",
             confidence=0.85 if impact.can_accommodate else 0.90,
-            impact_analysis=impact.model_dump(),
+            impact_analysis=impact_dict,
             priority=80 if not impact.can_accommodate else 60
         )
 
@@ -169,7 +239,7 @@ async def trigger_change_impact_analysis(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in change impact analysis: {e}")
+        logger.error("Error in change impact analysis: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -192,6 +262,8 @@ async def trigger_rfi_drafter(
     Returns:
         Agent action with drafted RFI
     """
+    from agents.rfi_drafter import draft_rfi
+
     try:
         await assert_project_access(supabase, user['id'], project_id)
 
@@ -215,7 +287,7 @@ async def trigger_rfi_drafter(
             action_data=rfi_draft.model_dump(),
             reasoning=rfi_draft.rationale,
             confidence=0.80,
-            priority={"Urgent": 90, "High": 70, "Medium": 50, "Low": 30}.get(rfi_draft.priority, 50)
+            priority=_RFI_PRIORITY.get(rfi_draft.priority, 50)
         )
 
         return action
@@ -223,7 +295,7 @@ async def trigger_rfi_drafter(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in RFI drafting: {e}")
+        logger.error("Error in RFI drafting: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -246,23 +318,25 @@ async def trigger_photo_analyzer(
     Returns:
         Agent action with photo analysis and detected violations
     """
+    from agents.photo_analyzer import analyze_photo, MAX_PHOTO_BYTES
+
     try:
-        await assert_project_access(supabase, user['id'], project_id)
+        if photo.size is not None and photo.size > MAX_PHOTO_BYTES:
+            raise HTTPException(status_code=413, detail=f"Photo exceeds {MAX_PHOTO_BYTES} byte limit")
 
-        # Read photo
-        photo_data = await photo.read()
+        await assert_project_access(supabase, user['id'], project_id)
 
-        # Run vision AI analysis
+        # Run vision AI analysis on the spooled upload file - large photos are
+        # downscaled straight from it instead of being read into memory first
         analysis: PhotoAnalysis = await analyze_photo(
             supabase=supabase,
             project_id=project_id,
-            image_data=photo_data,
+            image_data=photo.file,
             description=description
         )
 
         # Determine priority based on severity
-        priority_map = {"Critical": 95, "Warning": 70, "Info": 40}
-        priority = priority_map.get(analysis.severity, 50)
+        priority = _PHOTO_PRIORITY.get(analysis.severity, 50)
 
         # Queue for user approval
         action = await queue_agent_action(
@@ -284,7 +358,7 @@ async def trigger_photo_analyzer(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in photo analysis: {e}")
+        logger.error("Error in photo analysis: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -303,6 +377,8 @@ async def trigger_predictive_inspector(
     Returns:
         Agent action with inspection failure prediction
     """
+    from agents.predictive import predict_inspection
+
     try:
         await assert_project_access(supabase, user['id'], project_id)
 
@@ -340,7 +416,7 @@ async def trigger_predictive_inspector(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in inspection prediction: {e}")
+        logger.error("Error in inspection prediction: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -351,24 +427,30 @@ async def trigger_predictive_inspector(
 @router.get("/agent-actions/{project_id}", response_model=List[AgentActionResponse])
 async def get_pending_actions(
     project_id: str,
+    response: Response,
     agent_name: str = None,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
     user: dict = Depends(get_current_user),
     supabase: Client = Depends(get_supabase_client)
 ):
     """
-    Get all pending agent actions for a project
+    Get pending agent actions for a project, highest priority first
 
     Query Params:
         - agent_name: Filter by specific agent (optional)
+        - limit: Page size (default 50, max 200)
+        - offset: Number of actions to skip
 
     Returns:
-        List of pending agent actions
+        One page of pending agent actions; the X-Total-Count header carries
+        the total number of pending actions
     """
     try:
         await assert_project_access(supabase, user['id'], project_id)
 
         query = supabase.table('agent_actions') \
-            .select('*') \
+            .select('*', count='exact') \
             .eq('project_id', project_id) \
             .eq('user_id', user['id']) \
             .eq('status', 'pending') \
@@ -378,14 +460,17 @@ async def get_pending_actions(
         if agent_name:
             query = query.eq('agent_name', agent_name)
 
-        response = query.execute()
+        result = query.range(offset, offset + limit - 1).execute()
+
+        if result.count is not None:
+            response.headers['X-Total-Count'] = str(result.count)
 
-        return [AgentActionResponse(**action) for action in response.data]
+        return result.data
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching agent actions: {e}")
+        logger.error("Error fetching agent actions: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -406,18 +491,18 @@ async def approve_action(
         Success message
     """
     try:
-        # Update status
+        # Update status - only the affected row count comes back, not the row
         response = supabase.table('agent_actions') \
             .update({
                 "status": "approved",
                 "reviewed_at": datetime.utcnow().isoformat(),
                 "user_notes": user_notes
-            }) \
+            }, count='exact', returning='minimal') \
             .eq('id', action_id) \
             .eq('user_id', user['id']) \
             .execute()
 
-        if not response.data:
+        if not response.count:
             raise HTTPException(status_code=404, detail="Agent action not found")
 
         # TODO: Execute the action (create RFI, update specs, etc.)
@@ -428,7 +513,7 @@ async def approve_action(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error approving action: {e}")
+        logger.error("Error approving action: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -449,18 +534,18 @@ async def reject_action(
         Success message
     """
     try:
-        # Update status
+        # Update status - only the affected row count comes back, not the row
         response = supabase.table('agent_actions') \
             .update({
                 "status": "rejected",
                 "reviewed_at": datetime.utcnow().isoformat(),
                 "rejection_reason": reason
-            }) \
+            }, count='exact', returning='minimal') \
             .eq('id', action_id) \
             .eq('user_id', user['id']) \
             .execute()
 
-        if not response.data:
+        if not response.count:
             raise HTTPException(status_code=404, detail="Agent action not found")
 
         return {"success": True, "message": "Agent action rejected"}
@@ -468,5 +553,5 @@ async def reject_action(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error rejecting action: {e}")
+        logger.error("Error rejecting action: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
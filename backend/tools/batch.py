@@ -0,0 +1,67 @@
+"""
+Request batching for concurrent database tool calls
+
+Agent tools often run concurrently (parallel tool calls, gathered context
+queries) and each asks for rows by a single key. A BatchLoader collects the
+keys requested during one event-loop pass and resolves them all with one bulk
+query, instead of one HTTP round trip per key.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+import asyncio
+
+
+class BatchLoader:
+    """Coalesce single-key loads issued in the same event-loop pass into one batch call"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        default: Callable[[], Any] = lambda: None
+    ):
+        """
+        Args:
+            batch_fn: Loads many keys at once and returns a dict of key -> value
+            default: Factory for the value of keys missing from the batch result
+        """
+        self.batch_fn = batch_fn
+        self.default = default
+        self._pending: Optional[Dict[Hashable, "asyncio.Future[Any]"]] = None
+
+    async def load(self, key: Hashable) -> Any:
+        """
+        Load one key, batched with every other key requested before the next loop pass
+
+        Args:
+            key: Key to load
+
+        Returns:
+            The value from the batch result (or the default)
+        """
+        loop = asyncio.get_running_loop()
+        if self._pending is None:
+            self._pending = {}
+            loop.call_soon(self._dispatch)
+
+        future = self._pending.get(key)
+        if future is None:
+            future = loop.create_future()
+            self._pending[key] = future
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, None
+        asyncio.ensure_future(self._run(pending))
+
+    async def _run(self, pending: Dict[Hashable, "asyncio.Future[Any]"]) -> None:
+        try:
+            results = await self.batch_fn(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in pending.items():
+            if not future.done():
+                future.set_result(results[key] if key in results else self.default())
@@ -0,0 +1,152 @@
+"""
+In-process caching for read-only database tools and agent results
+
+A single agent run calls the same Supabase helpers several times (system prompt
+context, capacity pre-check, tool calls). A short-lived cache keyed on the
+query arguments avoids refetching identical rows within that window.
+"""
+
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import time
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded mapping with least-recently-used eviction and per-entry expiry"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def async_ttl_cache(
+    ttl: float = 30,
+    maxsize: int = 512,
+    cache_if: Callable[[Any], bool] = lambda result: result is not None
+):
+    """
+    Memoize an async `(supabase, *args)` database helper with LRU + TTL eviction
+
+    The Supabase client (first positional argument) is not part of the cache key;
+    the backend uses a single service-role client, so keys are the query arguments.
+
+    Args:
+        ttl: Seconds a cached result stays valid
+        maxsize: Maximum number of cached entries (least recently used evicted first)
+        cache_if: Predicate deciding whether a result should be cached (skips
+            error/None results by default so transient failures are retried)
+
+    Concurrent misses for the same key share a single call, so a burst of
+    requests for one project does not refetch the same rows in parallel.
+
+    Returns:
+        Decorator adding `cache_invalidate(*args)` and `cache_clear()` to the function
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        in_flight: Dict[Tuple, "asyncio.Future[Any]"] = {}
+
+        def make_key(args: Tuple, kwargs: Dict[str, Any]) -> Tuple:
+            return (args, tuple(sorted(kwargs.items()))) if kwargs else (args,)
+
+        def finish(key: Tuple, task: "asyncio.Future[Any]") -> None:
+            in_flight.pop(key, None)
+            if not task.cancelled() and task.exception() is None and cache_if(task.result()):
+                cache.set(key, task.result())
+
+        @wraps(func)
+        async def wrapper(supabase, *args, **kwargs):
+            key = make_key(args, kwargs)
+
+            result = cache.get(key, _MISSING)
+            if result is not _MISSING:
+                return result
+
+            task = in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(func(supabase, *args, **kwargs))
+                in_flight[key] = task
+                task.add_done_callback(lambda done: finish(key, done))
+
+            # Shielded so one cancelled caller does not cancel the shared fetch
+            return await asyncio.shield(task)
+
+        def cache_invalidate(*args, **kwargs) -> None:
+            cache.pop(make_key(args, kwargs))
+
+        wrapper.cache_invalidate = cache_invalidate
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
+
+
+async def run_cached(deps: Dict[str, Any], func: Callable[..., Awaitable[Any]], *args) -> Any:
+    """
+    Await `func(deps['supabase'], *args)` at most once per agent run
+
+    Results are memoized in `deps['cache']`, so the system prompt and every tool
+    call in the same run share one fetch per query.
+
+    Args:
+        deps: Agent run dependencies (must contain the Supabase client)
+        func: Async database helper taking the client as first argument
+        *args: Remaining helper arguments (must be hashable)
+
+    Returns:
+        The helper's result
+    """
+    cache = deps.setdefault('cache', {})
+    key = (func.__name__, args)
+    if key not in cache:
+        cache[key] = await func(deps['supabase'], *args)
+    return cache[key]
+
+
+def prime_cached(deps: Dict[str, Any], value: Any, func: Callable[..., Awaitable[Any]], *args) -> None:
+    """
+    Store a result for `run_cached(deps, func, *args)` fetched some other way
+
+    Lets tools in the same run reuse rows that arrived as part of a bundled query.
+
+    Args:
+        deps: Agent run dependencies
+        value: Result to return for the call
+        func: Database helper the result stands in for
+        *args: Helper arguments the result corresponds to
+    """
+    deps.setdefault('cache', {})[(func.__name__, args)] = value
@@ -5,12 +5,143 @@ These functions are exposed as tools that agents can call to fetch data from Sup
 """
 
 from supabase import Client
-from typing import List, Optional, Dict, Any
+from postgrest.exceptions import APIError
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from tools.cache import async_ttl_cache
+from tools.db_pool import get_pool, select_list, fetch_rows
+from tools.batch import BatchLoader
+from bisect import bisect_left
+from contextvars import ContextVar
+from operator import itemgetter
+import asyncio
+import asyncpg
+import heapq
+import httpx
 import logging
+import math
+import weakref
 
 logger = logging.getLogger(__name__)
 
+# Read-only project data is cached briefly so one agent run (system prompt,
+# pre-check and tool calls) does not refetch the same rows
+CACHE_TTL_SECONDS = 30
+CACHE_MAXSIZE = 512
 
+# Most Supabase queries one fan-out keeps in flight (the shared HTTP pool keeps
+# 20 connections alive, leaving room for concurrent requests)
+SUPABASE_MAX_CONCURRENCY = 10
+
+# Three-phase VA multiplier (the frontend calculators use Math.sqrt(3) as well)
+SQRT3 = math.sqrt(3.0)
+
+# Query failures the helpers log and degrade on (PostgREST, HTTP and direct
+# Postgres errors); anything else is a bug and propagates
+_QUERY_ERRORS = (APIError, httpx.HTTPError, asyncpg.PostgresError, asyncpg.InterfaceError, OSError)
+
+# Rows per request when reading whole tables; must not exceed the PostgREST
+# max-rows setting (Supabase default: 1000) or pages come back short
+PAGE_SIZE = 1000
+
+# Columns read by the load/utilization summaries
+PANEL_LOAD_COLUMNS = 'id,name,bus_rating,voltage,phase,num_spaces'
+CIRCUIT_LOAD_COLUMNS = 'id,panel_id,load_watts,pole,breaker_amps,description,load_type'
+LARGE_LOAD_COLUMNS = 'panel_id,load_watts,breaker_amps,description,load_type'
+_load_watts = itemgetter('load_watts')
+
+
+# Helpers log query failures and return empty results; a caller that must not
+# cache incomplete data (the bundle assembler) collects those failures here
+_query_failures: ContextVar[Optional[List[str]]] = ContextVar('query_failures', default=None)
+
+
+class _FailedRows(list):
+    """Empty result returned by a list helper whose query failed (never cached)"""
+
+
+def _cache_rows(rows: List[Dict[str, Any]]) -> bool:
+    """cache_if predicate for the cached list helpers: skip failed queries"""
+    return not isinstance(rows, _FailedRows)
+
+
+def _record_query_failure(what: str) -> None:
+    """Note a swallowed query failure for the collecting caller, if any"""
+    failures = _query_failures.get()
+    if failures is not None:
+        failures.append(what)
+
+
+async def _execute(query: Any) -> Any:
+    """
+    Execute a read-only PostgREST query, retrying once on a dropped pooled connection
+
+    supabase-py is synchronous, so the request runs in a worker thread; this
+    keeps the event loop free and lets queries started with asyncio.gather /
+    gather_bounded actually overlap on the shared connection pool.
+
+    Keep-alive connections in the shared HTTP pool can be closed by the server
+    while idle; the retry opens a fresh one instead of failing the tool call.
+
+    Args:
+        query: Supabase query builder (table select or rpc)
+
+    Returns:
+        The query response
+    """
+    try:
+        return await asyncio.to_thread(query.execute)
+    except (httpx.RemoteProtocolError, httpx.PoolTimeout) as e:
+        logger.warning("Retrying Supabase query after connection error: %s", type(e).__name__)
+        return await asyncio.to_thread(query.execute)
+
+
+async def _fetch_all_rows(build_query: Callable[[], Any], page_size: int = PAGE_SIZE) -> List[Dict[str, Any]]:
+    """
+    Read every row of a filtered query in fixed-size pages
+
+    A single request is capped at the PostgREST max-rows limit, so large
+    projects would otherwise be silently truncated. Pages are requested with
+    range() over a stable order until a short page comes back.
+
+    Args:
+        build_query: Returns a fresh filtered select query (builders are not reusable)
+        page_size: Rows per request
+
+    Returns:
+        All matching rows
+    """
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        response = await _execute(build_query().order('id').range(offset, offset + page_size - 1))
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        offset += page_size
+
+
+async def gather_bounded(*aws: Awaitable[Any], limit: int = SUPABASE_MAX_CONCURRENCY) -> List[Any]:
+    """
+    Like asyncio.gather, but run at most `limit` of the awaitables at once
+
+    Args:
+        *aws: Database helper coroutines
+        limit: Maximum number running concurrently
+
+    Returns:
+        Results in the order the awaitables were given
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable[Any]) -> Any:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
+
+@async_ttl_cache(ttl=CACHE_TTL_SECONDS, maxsize=CACHE_MAXSIZE)
 async def get_project_data(supabase: Client, project_id: str) -> Optional[Dict[str, Any]]:
     """
     Fetch complete project data including service parameters
@@ -23,90 +154,192 @@ async def get_project_data(supabase: Client, project_id: str) -> Optional[Dict[s
         Project data dict or None
     """
     try:
-        response = supabase.table('projects').select('*').eq('id', project_id).single().execute()
-        return response.data if response.data else None
-    except Exception as e:
-        logger.error(f"Error fetching project {project_id}: {e}")
+        # limit(1) instead of single(): a missing project is an empty result, not an error
+        response = await _execute(supabase.table('projects').select('*').eq('id', project_id).limit(1))
+        return response.data[0] if response.data else None
+    except _QUERY_ERRORS as e:
+        logger.error("Error fetching project %s: %s", project_id, e)
         return None
 
 
-async def get_all_panels(supabase: Client, project_id: str) -> List[Dict[str, Any]]:
+@async_ttl_cache(ttl=CACHE_TTL_SECONDS, maxsize=CACHE_MAXSIZE, cache_if=_cache_rows)
+async def get_all_panels(supabase: Client, project_id: str, columns: str = '*') -> List[Dict[str, Any]]:
     """
     Fetch all panels for a project with hierarchy information
 
     Args:
         supabase: Supabase client
         project_id: Project UUID
+        columns: PostgREST column projection (defaults to full rows)
 
     Returns:
         List of panel dicts
     """
     try:
-        response = supabase.table('panels').select('*').eq('project_id', project_id).execute()
-        return response.data if response.data else []
-    except Exception as e:
-        logger.error(f"Error fetching panels for project {project_id}: {e}")
-        return []
+        pool = get_pool()
+        if pool is not None:
+            return await fetch_rows(
+                pool, f'SELECT {select_list(columns)} FROM public.panels WHERE project_id = $1', project_id
+            )
+
+        return await _fetch_all_rows(
+            lambda: supabase.table('panels').select(columns).eq('project_id', project_id)
+        )
+    except _QUERY_ERRORS as e:
+        logger.error("Error fetching panels for project %s: %s", project_id, e)
+        _record_query_failure('panels')
+        return _FailedRows()
+
+
+def build_panel_name_index(panels: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Index panels by case-insensitive name for O(1) lookups
+
+    Args:
+        panels: Panel dicts (e.g. from get_all_panels)
+
+    Returns:
+        Dict of casefolded panel name -> panel (first panel wins on duplicate names)
+    """
+    index: Dict[str, Dict[str, Any]] = {}
+    for panel in panels:
+        index.setdefault((panel.get('name') or '').casefold(), panel)
+    return index
 
 
-async def get_panel_circuits(supabase: Client, panel_id: str) -> List[Dict[str, Any]]:
+async def get_panel_circuits(supabase: Client, panel_id: str, columns: str = '*') -> List[Dict[str, Any]]:
     """
     Fetch all circuits for a specific panel
 
     Args:
         supabase: Supabase client
         panel_id: Panel UUID
+        columns: PostgREST column projection (defaults to full rows)
 
     Returns:
         List of circuit dicts
     """
-    try:
-        response = supabase.table('circuits').select('*').eq('panel_id', panel_id).execute()
-        return response.data if response.data else []
-    except Exception as e:
-        logger.error(f"Error fetching circuits for panel {panel_id}: {e}")
-        return []
+    # Concurrent calls (e.g. parallel tool calls) share one panel_id IN (...) query
+    return await _panel_circuit_loader(supabase, columns).load(panel_id)
+
 
+# Loaders per event loop, keyed by (client identity, column projection); each
+# loader holds its client, so the id cannot be reused while the entry exists
+_panel_circuit_loaders: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[int, str], BatchLoader]]" = \
+    weakref.WeakKeyDictionary()
 
-async def get_all_feeders(supabase: Client, project_id: str) -> List[Dict[str, Any]]:
+
+def _panel_circuit_loader(supabase: Client, columns: str) -> BatchLoader:
+    """Get the batch loader serving get_panel_circuits for this loop, client and projection"""
+    loaders = _panel_circuit_loaders.setdefault(asyncio.get_running_loop(), {})
+    key = (id(supabase), columns)
+    loader = loaders.get(key)
+    if loader is None:
+        loader = BatchLoader(
+            lambda panel_ids: get_circuits_for_panels(supabase, panel_ids, columns),
+            default=list
+        )
+        loaders[key] = loader
+    return loader
+
+
+async def get_circuits_for_panels(
+    supabase: Client,
+    panel_ids: List[str],
+    columns: str = '*'
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Fetch circuits for several panels in a single (paged) query
+
+    Args:
+        supabase: Supabase client
+        panel_ids: Panel UUIDs
+        columns: PostgREST column projection (panel_id is added if missing)
+
+    Returns:
+        Dict mapping each panel_id to its list of circuit dicts (empty list if none)
+    """
+    circuits_by_panel: Dict[str, List[Dict[str, Any]]] = {panel_id: [] for panel_id in panel_ids}
+    if not circuits_by_panel:
+        return circuits_by_panel
+
+    # Rows are grouped by panel_id, so it must be selected
+    if columns != '*' and 'panel_id' not in columns.split(','):
+        columns = f'{columns},panel_id'
+
+    try:
+        pool = get_pool()
+        if pool is not None:
+            rows = await fetch_rows(
+                pool,
+                f'SELECT {select_list(columns)} FROM public.circuits WHERE panel_id = ANY($1::uuid[])',
+                list(circuits_by_panel)
+            )
+        else:
+            # Paged: one IN (...) query can exceed the PostgREST max-rows cap
+            rows = await _fetch_all_rows(
+                lambda: supabase.table('circuits').select(columns).in_('panel_id', list(circuits_by_panel))
+            )
+
+        for panel_id, circuits in _group_circuits_by_panel(rows).items():
+            circuits_by_panel[panel_id] = circuits
+        return circuits_by_panel
+    except _QUERY_ERRORS as e:
+        logger.error("Error fetching circuits for panels %s: %s", list(panel_ids), e)
+        _record_query_failure('circuits')
+        return circuits_by_panel
+
+
+@async_ttl_cache(ttl=CACHE_TTL_SECONDS, maxsize=CACHE_MAXSIZE, cache_if=_cache_rows)
+async def get_all_feeders(supabase: Client, project_id: str, columns: str = '*') -> List[Dict[str, Any]]:
     """
     Fetch all feeders for a project
 
     Args:
         supabase: Supabase client
         project_id: Project UUID
+        columns: PostgREST column projection (defaults to full rows)
 
     Returns:
         List of feeder dicts
     """
     try:
-        response = supabase.table('feeders').select('*').eq('project_id', project_id).execute()
-        return response.data if response.data else []
-    except Exception as e:
-        logger.error(f"Error fetching feeders for project {project_id}: {e}")
-        return []
+        return await _fetch_all_rows(
+            lambda: supabase.table('feeders').select(columns).eq('project_id', project_id)
+        )
+    except _QUERY_ERRORS as e:
+        logger.error("Error fetching feeders for project %s: %s", project_id, e)
+        _record_query_failure('feeders')
+        return _FailedRows()
 
 
-async def get_all_issues(supabase: Client, project_id: str) -> List[Dict[str, Any]]:
+async def get_all_issues(supabase: Client, project_id: str, columns: str = '*') -> List[Dict[str, Any]]:
     """
     Fetch all open issues for a project
 
     Args:
         supabase: Supabase client
         project_id: Project UUID
+        columns: PostgREST column projection (defaults to full rows)
 
     Returns:
         List of issue dicts
     """
     try:
-        response = supabase.table('issues').select('*').eq('project_id', project_id).eq('status', 'Open').execute()
+        response = await _execute(supabase.table('issues').select(columns).eq('project_id', project_id).eq('status', 'Open'))
         return response.data if response.data else []
-    except Exception as e:
-        logger.error(f"Error fetching issues for project {project_id}: {e}")
+    except _QUERY_ERRORS as e:
+        logger.error("Error fetching issues for project %s: %s", project_id, e)
+        _record_query_failure('issues')
         return []
 
 
-async def get_recent_rfis(supabase: Client, project_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+async def get_recent_rfis(
+    supabase: Client,
+    project_id: str,
+    limit: int = 5,
+    columns: str = '*'
+) -> List[Dict[str, Any]]:
     """
     Fetch recent RFIs for context
 
@@ -114,22 +347,23 @@ async def get_recent_rfis(supabase: Client, project_id: str, limit: int = 5) ->
         supabase: Supabase client
         project_id: Project UUID
         limit: Number of RFIs to fetch
+        columns: PostgREST column projection (defaults to full rows)
 
     Returns:
         List of RFI dicts
     """
     try:
-        response = (
+        response = await _execute(
             supabase.table('rfis')
-            .select('*')
+            .select(columns)
             .eq('project_id', project_id)
             .order('created_at', desc=True)
             .limit(limit)
-            .execute()
         )
         return response.data if response.data else []
-    except Exception as e:
-        logger.error(f"Error fetching RFIs for project {project_id}: {e}")
+    except _QUERY_ERRORS as e:
+        logger.error("Error fetching RFIs for project %s: %s", project_id, e)
+        _record_query_failure('rfis')
         return []
 
 
@@ -142,18 +376,59 @@ async def calculate_total_panel_load(supabase: Client, panel_id: str) -> float:
         panel_id: Panel UUID
 
     Returns:
-        Total load in VA (uses load_watts if load_va not available)
+        Total load in VA
     """
+    # Summed in Postgres when the panel totals function is deployed
     try:
-        circuits = await get_panel_circuits(supabase, panel_id)
-        # Circuits typically store load_watts, not load_va
-        total_load = sum(c.get('load_va') or c.get('load_watts') or 0 for c in circuits)
-        return total_load
-    except Exception as e:
-        logger.error(f"Error calculating panel load for {panel_id}: {e}")
+        response = await _execute(supabase.rpc('get_panel_load_totals', {'p_panel_id': panel_id}))
+        return float(response.data['total_load_va']) if response.data else 0.0
+    except _QUERY_ERRORS as e:
+        logger.warning("get_panel_load_totals RPC failed for %s, using table queries: %s", panel_id, e)
+
+    try:
+        circuits = await get_panel_circuits(supabase, panel_id, columns='load_watts')
+        # load_watts is NOT NULL, so no per-row fallbacks are needed
+        return math.fsum(map(_load_watts, circuits))
+    except _QUERY_ERRORS as e:
+        logger.error("Error calculating panel load for %s: %s", panel_id, e)
         return 0.0
 
 
+async def _fetch_project_panel_load_totals(supabase: Client, project_id: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Per-panel load totals for a project from the `get_project_panel_load_totals` function
+
+    Returns:
+        One row per panel (panel_id, total_load_va, poles_used, circuit_count),
+        or None if the function call failed (callers fall back to table queries)
+    """
+    try:
+        response = await _execute(supabase.rpc('get_project_panel_load_totals', {'p_project_id': project_id}))
+        return response.data or []
+    except _QUERY_ERRORS as e:
+        logger.warning("get_project_panel_load_totals RPC failed for %s, using table queries: %s", project_id, e)
+        return None
+
+
+async def _fetch_project_load_total(supabase: Client, project_id: str) -> Optional[float]:
+    """
+    Connected load of a project from the trigger-maintained `project_load_totals` table
+
+    Returns:
+        Total load in VA (0 for a project that has never had circuits), or None
+        if the query failed (callers fall back to summing circuits)
+    """
+    try:
+        response = await _execute(
+            supabase.table('project_load_totals').select('load_va').eq('project_id', project_id).limit(1)
+        )
+        return float(response.data[0]['load_va']) if response.data else 0.0
+    except _QUERY_ERRORS as e:
+        logger.warning("project_load_totals read failed for %s, using table queries: %s", project_id, e)
+        return None
+
+
+@async_ttl_cache(ttl=CACHE_TTL_SECONDS, maxsize=CACHE_MAXSIZE, cache_if=lambda r: "error" not in r)
 async def get_service_utilization(supabase: Client, project_id: str) -> Dict[str, Any]:
     """
     Calculate current service utilization
@@ -166,63 +441,91 @@ async def get_service_utilization(supabase: Client, project_id: str) -> Dict[str
         Dict with service_size, total_load, utilization_percent
     """
     try:
-        # Get project service size
-        project = await get_project_data(supabase, project_id)
+        # project_load_totals is kept up to date by triggers on circuits
+        project, load_total = await asyncio.gather(
+            get_project_data(supabase, project_id),
+            _fetch_project_load_total(supabase, project_id)
+        )
         if not project:
             return {"error": "Project not found"}
 
-        # Note: Database field is 'service_amps', not 'service_size'
-        service_size = project.get('service_amps') or project.get('service_size') or 200
-        voltage = project.get('voltage') or 240
-        phases = project.get('phases') or 1
-
-        # Get all panels
-        panels = await get_all_panels(supabase, project_id)
+        if load_total is not None:
+            return _summarize_service_utilization(project, load_total)
 
-        # Calculate total load
-        total_load_va = 0
-        for panel in panels:
-            panel_load = await calculate_total_panel_load(supabase, panel['id'])
-            total_load_va += panel_load
+        # Table not migrated yet - sum the per-panel totals from Postgres
+        panel_totals = await _fetch_project_panel_load_totals(supabase, project_id)
+        if panel_totals is not None:
+            total_load_va = sum(float(row['total_load_va']) for row in panel_totals)
+            return _summarize_service_utilization(project, total_load_va)
 
-        # Calculate service capacity in VA
-        if phases == 3:
-            service_capacity_va = service_size * voltage * 1.732  # sqrt(3)
-        else:
-            service_capacity_va = service_size * voltage
+        # Panels and circuits are independent queries;
+        # each helper logs and returns an empty result on failure
+        panels, circuits = await asyncio.gather(
+            get_all_panels(supabase, project_id, columns='id'),
+            get_all_circuits(supabase, project_id, columns='panel_id,load_watts')
+        )
 
-        utilization_percent = (total_load_va / service_capacity_va * 100) if service_capacity_va > 0 else 0
+        # Calculate total load over circuits on the project's panels
+        panel_ids = {panel['id'] for panel in panels}
+        total_load_va = math.fsum(
+            c['load_watts'] or 0
+            for c in circuits
+            if c.get('panel_id') in panel_ids
+        )
 
-        return {
-            "service_size": service_size,
-            "voltage": voltage,
-            "phases": phases,
-            "service_capacity_va": service_capacity_va,
-            "total_load_va": total_load_va,
-            "utilization_percent": utilization_percent
-        }
+        return _summarize_service_utilization(project, total_load_va)
 
     except Exception as e:
-        logger.error(f"Error calculating service utilization for {project_id}: {e}")
+        logger.error("Error calculating service utilization for %s: %s", project_id, e)
         return {"error": str(e)}
 
 
-async def get_all_circuits(supabase: Client, project_id: str) -> List[Dict[str, Any]]:
+def _summarize_service_utilization(project: Dict[str, Any], total_load_va: float) -> Dict[str, Any]:
+    """Build the service utilization summary from a project row and its connected load"""
+    # Note: Database field is 'service_amps', not 'service_size'
+    service_size = project.get('service_amps') or project.get('service_size') or 200
+    voltage = project.get('voltage') or 240
+    phases = project.get('phases') or 1
+
+    # Calculate service capacity in VA
+    service_capacity_va = service_size * voltage * (SQRT3 if phases == 3 else 1.0)
+
+    utilization_percent = (total_load_va / service_capacity_va * 100) if service_capacity_va > 0 else 0
+
+    return {
+        "service_size": service_size,
+        "voltage": voltage,
+        "phases": phases,
+        "service_capacity_va": service_capacity_va,
+        "total_load_va": total_load_va,
+        "utilization_percent": utilization_percent
+    }
+
+
+async def get_all_circuits(supabase: Client, project_id: str, columns: str = '*') -> List[Dict[str, Any]]:
     """
     Fetch all circuits for a project (across all panels)
 
     Args:
         supabase: Supabase client
         project_id: Project UUID
+        columns: PostgREST column projection (defaults to full rows)
 
     Returns:
         List of circuit dicts
     """
     try:
-        response = supabase.table('circuits').select('*').eq('project_id', project_id).execute()
-        return response.data if response.data else []
-    except Exception as e:
-        logger.error(f"Error fetching circuits for project {project_id}: {e}")
+        pool = get_pool()
+        if pool is not None:
+            return await fetch_rows(
+                pool, f'SELECT {select_list(columns)} FROM public.circuits WHERE project_id = $1', project_id
+            )
+
+        return await _fetch_all_rows(
+            lambda: supabase.table('circuits').select(columns).eq('project_id', project_id)
+        )
+    except _QUERY_ERRORS as e:
+        logger.error("Error fetching circuits for project %s: %s", project_id, e)
         return []
 
 
@@ -237,55 +540,160 @@ async def get_panel_utilization(supabase: Client, panel_id: str) -> Dict[str, An
     Returns:
         Dict with detailed panel utilization info
     """
+    # Panel row and circuit totals aggregated in Postgres (one round trip,
+    # no circuit rows transferred)
+    try:
+        response = await _execute(supabase.rpc('get_panel_load_totals', {'p_panel_id': panel_id}))
+        totals = response.data
+        if not totals:
+            return {"error": f"Panel {panel_id} not found"}
+        return _summarize_panel_totals(
+            panel_id,
+            totals['panel'],
+            totals['total_load_va'],
+            totals['poles_used'],
+            totals['circuit_count']
+        )
+    except _QUERY_ERRORS as e:
+        logger.warning("get_panel_load_totals RPC failed for %s, using table queries: %s", panel_id, e)
+
     try:
         # Get panel info
-        panel_response = supabase.table('panels').select('*').eq('id', panel_id).single().execute()
-        panel = panel_response.data if panel_response.data else {}
+        panel_response = await _execute(supabase.table('panels').select(PANEL_LOAD_COLUMNS).eq('id', panel_id).limit(1))
+        if not panel_response.data:
+            return {"error": f"Panel {panel_id} not found"}
+        panel = panel_response.data[0]
 
         # Get circuits for this panel
-        circuits = await get_panel_circuits(supabase, panel_id)
+        circuits = await get_panel_circuits(supabase, panel_id, columns=CIRCUIT_LOAD_COLUMNS)
 
-        bus_rating = panel.get('bus_rating') or 200
-        voltage = panel.get('voltage') or 240
-        phases = panel.get('phase') or panel.get('phases') or 1
-        max_spaces = panel.get('spaces') or 42
+        return _summarize_panel_utilization(panel_id, panel, circuits)
+    except Exception as e:
+        logger.error("Error calculating panel utilization for %s: %s", panel_id, e)
+        return {"error": str(e)}
 
-        # Calculate load - circuits use load_watts
-        total_load_va = sum(c.get('load_va') or c.get('load_watts') or 0 for c in circuits)
-        total_poles_used = sum(c.get('pole', 1) for c in circuits)
 
-        # Calculate capacity
-        if phases == 3:
-            capacity_va = bus_rating * voltage * 1.732
-        else:
-            capacity_va = bus_rating * voltage
+async def get_all_panels_utilization(
+    supabase: Client,
+    project_id: str,
+    panels: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Calculate detailed utilization for every panel in a project
 
-        capacity_amps = bus_rating
-        current_load_amps = total_load_va / voltage if voltage > 0 else 0
-        available_amps = capacity_amps - current_load_amps
-        utilization_percent = (total_load_va / capacity_va * 100) if capacity_va > 0 else 0
+    Uses per-panel totals aggregated in Postgres; if that function is not
+    deployed, fetches all project circuits in one query and groups them by
+    panel, instead of issuing a panel + circuits query per panel.
 
-        return {
-            "panel_id": panel_id,
-            "panel_name": panel.get('name', 'Unknown'),
-            "bus_rating_amps": bus_rating,
-            "voltage": voltage,
-            "phases": phases,
-            "capacity_va": capacity_va,
-            "current_load_va": total_load_va,
-            "current_load_amps": round(current_load_amps, 1),
-            "available_amps": round(available_amps, 1),
-            "utilization_percent": round(utilization_percent, 1),
-            "total_spaces": max_spaces,
-            "spaces_used": total_poles_used,
-            "spaces_available": max_spaces - total_poles_used,
-            "circuit_count": len(circuits),
-            "can_add_load": utilization_percent < 80,
-            "status": "OK" if utilization_percent < 80 else "WARNING" if utilization_percent < 100 else "OVERLOADED"
-        }
+    Args:
+        supabase: Supabase client
+        project_id: Project UUID
+        panels: Already-fetched panels for the project (fetched if omitted)
+
+    Returns:
+        List of panel utilization dicts (same shape as get_panel_utilization)
+    """
+    try:
+        if panels is None:
+            # Panel rows and their load totals are independent queries
+            panels, panel_totals = await asyncio.gather(
+                get_all_panels(supabase, project_id, columns=PANEL_LOAD_COLUMNS),
+                _fetch_project_panel_load_totals(supabase, project_id)
+            )
+        else:
+            panel_totals = await _fetch_project_panel_load_totals(supabase, project_id)
+        if not panels:
+            return []
+
+        if panel_totals is not None:
+            totals_by_panel = {row['panel_id']: row for row in panel_totals}
+            summaries = []
+            for panel in panels:
+                totals = totals_by_panel.get(panel['id'])
+                summaries.append(_summarize_panel_totals(
+                    panel['id'],
+                    panel,
+                    float(totals['total_load_va']) if totals else 0,
+                    totals['poles_used'] if totals else 0,
+                    totals['circuit_count'] if totals else 0
+                ))
+            return summaries
+
+        circuits = await get_all_circuits(supabase, project_id, columns=CIRCUIT_LOAD_COLUMNS)
+        circuits_by_panel = _group_circuits_by_panel(circuits)
+
+        return [
+            _summarize_panel_utilization(panel['id'], panel, circuits_by_panel.get(panel['id'], []))
+            for panel in panels
+        ]
     except Exception as e:
-        logger.error(f"Error calculating panel utilization for {panel_id}: {e}")
-        return {"error": str(e)}
+        logger.error("Error calculating panel utilization for project %s: %s", project_id, e)
+        return []
+
+
+def _group_circuits_by_panel(circuits: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group circuit rows by panel_id"""
+    circuits_by_panel: Dict[str, List[Dict[str, Any]]] = {}
+    for circuit in circuits:
+        circuits_by_panel.setdefault(circuit.get('panel_id'), []).append(circuit)
+    return circuits_by_panel
+
+
+def _summarize_panel_utilization(
+    panel_id: str,
+    panel: Dict[str, Any],
+    circuits: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Build the panel utilization summary from a panel row and its circuits"""
+    # Calculate load and poles in one pass - circuits use load_watts
+    total_load_va = 0
+    total_poles_used = 0
+    for c in circuits:
+        total_load_va += c['load_watts'] or 0
+        total_poles_used += c.get('pole', 1)
+
+    return _summarize_panel_totals(panel_id, panel, total_load_va, total_poles_used, len(circuits))
+
+
+def _summarize_panel_totals(
+    panel_id: str,
+    panel: Dict[str, Any],
+    total_load_va: float,
+    total_poles_used: int,
+    circuit_count: int
+) -> Dict[str, Any]:
+    """Build the panel utilization summary from a panel row and its aggregated circuit totals"""
+    bus_rating = panel.get('bus_rating') or 200
+    voltage = panel.get('voltage') or 240
+    phases = panel.get('phase') or panel.get('phases') or 1
+    max_spaces = panel.get('num_spaces') or panel.get('spaces') or 42
+
+    # Calculate capacity
+    capacity_va = bus_rating * voltage * (SQRT3 if phases == 3 else 1.0)
+
+    capacity_amps = bus_rating
+    current_load_amps = total_load_va / voltage if voltage > 0 else 0
+    available_amps = capacity_amps - current_load_amps
+    utilization_percent = (total_load_va / capacity_va * 100) if capacity_va > 0 else 0
+
+    return {
+        "panel_id": panel_id,
+        "panel_name": panel.get('name', 'Unknown'),
+        "bus_rating_amps": bus_rating,
+        "voltage": voltage,
+        "phases": phases,
+        "capacity_va": capacity_va,
+        "current_load_va": total_load_va,
+        "current_load_amps": round(current_load_amps, 1),
+        "available_amps": round(available_amps, 1),
+        "utilization_percent": round(utilization_percent, 1),
+        "total_spaces": max_spaces,
+        "spaces_used": total_poles_used,
+        "spaces_available": max_spaces - total_poles_used,
+        "circuit_count": circuit_count,
+        "can_add_load": utilization_percent < 80,
+        "status": "OK" if utilization_percent < 80 else "WARNING" if utilization_percent < 100 else "OVERLOADED"
+    }
 
 
 async def check_service_capacity(
@@ -308,61 +716,69 @@ async def check_service_capacity(
         # Get current service utilization
         service_util = await get_service_utilization(supabase, project_id)
 
-        if "error" in service_util:
-            return {"error": service_util["error"], "can_proceed": False}
+        return _summarize_service_capacity(service_util, additional_load_amps)
+    except Exception as e:
+        logger.error("Error checking service capacity: %s", e)
+        return {"error": str(e), "can_proceed": False}
 
-        service_size = service_util.get('service_size', 200)
-        voltage = service_util.get('voltage', 240)
-        current_load_va = service_util.get('total_load_va', 0)
-        current_load_amps = current_load_va / voltage if voltage > 0 else 0
 
-        # Calculate new totals
-        additional_load_va = additional_load_amps * voltage
-        new_total_va = current_load_va + additional_load_va
-        new_total_amps = current_load_amps + additional_load_amps
+def _summarize_service_capacity(service_util: Dict[str, Any], additional_load_amps: float) -> Dict[str, Any]:
+    """Build the capacity check result from a service utilization summary"""
+    if "error" in service_util:
+        return {"error": service_util["error"], "can_proceed": False}
 
-        # Calculate capacity
-        capacity_va = service_util.get('service_capacity_va', service_size * voltage)
+    service_size = service_util.get('service_size', 200)
+    voltage = service_util.get('voltage', 240)
+    current_load_va = service_util.get('total_load_va', 0)
+    current_load_amps = current_load_va / voltage if voltage > 0 else 0
 
-        # Determine status
-        new_utilization = (new_total_va / capacity_va * 100) if capacity_va > 0 else 0
-        available_amps = service_size - current_load_amps
-        remaining_after_change = service_size - new_total_amps
+    # Calculate new totals
+    additional_load_va = additional_load_amps * voltage
+    new_total_va = current_load_va + additional_load_va
+    new_total_amps = current_load_amps + additional_load_amps
 
-        # Determine if change can proceed
-        can_proceed = new_utilization <= 80  # NEC recommends 80% max continuous
-        requires_upgrade = new_utilization > 100
-        warning = 80 < new_utilization <= 100
+    # Calculate capacity
+    capacity_va = service_util.get('service_capacity_va', service_size * voltage)
 
-        return {
-            "can_proceed": can_proceed,
-            "requires_service_upgrade": requires_upgrade,
-            "warning": warning,
-            "service_size_amps": service_size,
-            "current_load_amps": round(current_load_amps, 1),
-            "proposed_additional_amps": additional_load_amps,
-            "new_total_amps": round(new_total_amps, 1),
-            "available_before_change_amps": round(available_amps, 1),
-            "remaining_after_change_amps": round(remaining_after_change, 1),
-            "current_utilization_percent": round(service_util.get('utilization_percent', 0), 1),
-            "new_utilization_percent": round(new_utilization, 1),
-            "recommended_service_size": _get_recommended_service_size(new_total_amps) if requires_upgrade else None,
-            "verdict": _get_capacity_verdict(new_utilization, remaining_after_change)
-        }
-    except Exception as e:
-        logger.error(f"Error checking service capacity: {e}")
-        return {"error": str(e), "can_proceed": False}
+    # Determine status
+    new_utilization = (new_total_va / capacity_va * 100) if capacity_va > 0 else 0
+    available_amps = service_size - current_load_amps
+    remaining_after_change = service_size - new_total_amps
+
+    # Determine if change can proceed
+    can_proceed = new_utilization <= 80  # NEC recommends 80% max continuous
+    requires_upgrade = new_utilization > 100
+    warning = 80 < new_utilization <= 100
+
+    return {
+        "can_proceed": can_proceed,
+        "requires_service_upgrade": requires_upgrade,
+        "warning": warning,
+        "service_size_amps": service_size,
+        "current_load_amps": round(current_load_amps, 1),
+        "proposed_additional_amps": additional_load_amps,
+        "new_total_amps": round(new_total_amps, 1),
+        "available_before_change_amps": round(available_amps, 1),
+        "remaining_after_change_amps": round(remaining_after_change, 1),
+        "current_utilization_percent": round(service_util.get('utilization_percent', 0), 1),
+        "new_utilization_percent": round(new_utilization, 1),
+        "recommended_service_size": _get_recommended_service_size(new_total_amps) if requires_upgrade else None,
+        "verdict": _get_capacity_verdict(new_utilization, remaining_after_change)
+    }
+
+
+# Standard service sizes in amps, ascending
+STANDARD_SERVICE_SIZES = (100, 125, 150, 200, 225, 320, 400, 600, 800, 1000, 1200)
 
 
 def _get_recommended_service_size(required_amps: float) -> int:
     """Get next standard service size that can handle the load"""
-    standard_sizes = [100, 125, 150, 200, 225, 320, 400, 600, 800, 1000, 1200]
     # Apply 80% rule - service should be at most 80% loaded
     required_service = required_amps / 0.8
-    for size in standard_sizes:
-        if size >= required_service:
-            return size
-    return 1200  # Max standard residential
+    idx = bisect_left(STANDARD_SERVICE_SIZES, required_service)
+    if idx < len(STANDARD_SERVICE_SIZES):
+        return STANDARD_SERVICE_SIZES[idx]
+    return STANDARD_SERVICE_SIZES[-1]  # Max standard residential
 
 
 def _get_capacity_verdict(utilization: float, remaining_amps: float) -> str:
@@ -377,7 +793,12 @@ def _get_capacity_verdict(utilization: float, remaining_amps: float) -> str:
         return f"APPROVE - Service has adequate capacity. {remaining_amps:.0f}A remaining after change."
 
 
-async def get_large_loads(supabase: Client, project_id: str, min_amps: int = 20) -> List[Dict[str, Any]]:
+async def get_large_loads(
+    supabase: Client,
+    project_id: str,
+    min_amps: int = 20,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
     """
     Fetch all large loads (circuits) in the project
 
@@ -385,29 +806,137 @@ async def get_large_loads(supabase: Client, project_id: str, min_amps: int = 20)
         supabase: Supabase client
         project_id: Project UUID
         min_amps: Minimum breaker size to consider "large"
+        limit: Return only the largest N loads (all if None)
 
     Returns:
-        List of large load circuits
+        List of large load circuits, largest breaker first
     """
     try:
-        circuits = await get_all_circuits(supabase, project_id)
-        large_loads = [
-            {
-                "description": c.get('description', 'Unknown'),
-                "breaker_amps": c.get('breaker_amps', 0),
-                "load_va": c.get('load_va', c.get('load_watts', 0)),
-                "load_type": c.get('load_type', 'Unknown'),
-                "panel_id": c.get('panel_id')
-            }
-            for c in circuits
-            if c.get('breaker_amps', 0) >= min_amps
+        # Filter and order in Postgres (served by idx_circuits_project_breaker)
+        query = supabase.table('circuits') \
+            .select(LARGE_LOAD_COLUMNS) \
+            .eq('project_id', project_id) \
+            .gte('breaker_amps', min_amps) \
+            .order('breaker_amps', desc=True)
+        if limit is not None:
+            query = query.limit(limit)
+
+        response = await _execute(query)
+        return [_format_large_load(c) for c in response.data or []]
+    except _QUERY_ERRORS as e:
+        logger.error("Error fetching large loads: %s", e)
+        return []
+
+
+def _format_large_load(circuit: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a circuit row for the large load listing"""
+    return {
+        "description": circuit.get('description', 'Unknown'),
+        "breaker_amps": circuit.get('breaker_amps', 0),
+        "load_va": circuit['load_watts'],
+        "load_type": circuit.get('load_type', 'Unknown'),
+        "panel_id": circuit.get('panel_id')
+    }
+
+
+def _select_large_loads(
+    circuits: List[Dict[str, Any]],
+    min_amps: int,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Pick circuits with breakers >= min_amps, largest first (for rows already in memory)"""
+    large_loads = [
+        _format_large_load(c)
+        for c in circuits
+        if c.get('breaker_amps', 0) >= min_amps
+    ]
+    if limit is not None:
+        # Partial selection keeps only the top N instead of sorting everything
+        return heapq.nlargest(limit, large_loads, key=lambda x: x['breaker_amps'])
+    large_loads.sort(key=lambda x: x['breaker_amps'], reverse=True)
+    return large_loads
+
+
+async def get_change_impact_context(
+    supabase: Client,
+    project_id: str,
+    proposed_load_amps: float,
+    large_load_min_amps: int = 20,
+    large_load_limit: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Fetch and summarize everything the change impact agent needs in one round trip
+
+    Calls the `get_change_impact_context` Postgres function, which returns the
+    project, its panels and its circuits as one JSON document. Falls back to
+    separate (concurrent) table queries if the function is not deployed.
+
+    Args:
+        supabase: Supabase client
+        project_id: Project UUID
+        proposed_load_amps: Proposed additional load in amps (for the capacity check)
+        large_load_min_amps: Minimum breaker size to report as a large load
+        large_load_limit: Report only the largest N large loads (all if None)
+
+    Returns:
+        Dict with project, service_utilization, capacity_check, panels,
+        panel_utilization and large_loads, or None if the project is not found
+    """
+    try:
+        response = await _execute(supabase.rpc('get_change_impact_context', {'p_project_id': project_id}))
+        bundle = response.data
+        if not bundle:
+            return None
+        project = bundle.get('project')
+        panels = bundle.get('panels') or []
+        circuits = bundle.get('circuits') or []
+    except _QUERY_ERRORS as e:
+        logger.warning("get_change_impact_context RPC failed for %s, using table queries: %s", project_id, e)
+        project, panels, circuits = await asyncio.gather(
+            get_project_data(supabase, project_id),
+            get_all_panels(supabase, project_id, columns=PANEL_LOAD_COLUMNS),
+            get_all_circuits(supabase, project_id, columns=CIRCUIT_LOAD_COLUMNS)
+        )
+
+    if not project:
+        return None
+
+    try:
+        circuits_by_panel = _group_circuits_by_panel(circuits)
+        panel_utilization = [
+            _summarize_panel_utilization(panel['id'], panel, circuits_by_panel.get(panel['id'], []))
+            for panel in panels
         ]
-        return sorted(large_loads, key=lambda x: x['breaker_amps'], reverse=True)
+
+        # Service load counts circuits on the project's panels (matches get_service_utilization)
+        total_load_va = sum(p['current_load_va'] for p in panel_utilization)
+        service_util = _summarize_service_utilization(project, total_load_va)
+
+        return {
+            "project": project,
+            "service_utilization": service_util,
+            "capacity_check": _summarize_service_capacity(service_util, proposed_load_amps),
+            "panels": panels,
+            "panel_utilization": panel_utilization,
+            "large_loads": _select_large_loads(circuits, large_load_min_amps, large_load_limit)
+        }
     except Exception as e:
-        logger.error(f"Error fetching large loads: {e}")
-        return []
+        logger.error("Error building change impact context for %s: %s", project_id, e)
+        return None
+
+
+# Columns formatted into the grounding summary
+GROUNDING_COLUMNS = 'gec_size,electrodes,bonding,notes'
+
+# Placeholder shown in the grounding fields when the query fails (never cached)
+_GROUNDING_FETCH_ERROR = "Error fetching data"
 
 
+@async_ttl_cache(
+    ttl=CACHE_TTL_SECONDS,
+    maxsize=CACHE_MAXSIZE,
+    cache_if=lambda r: r is not None and r.get('gec_size') != _GROUNDING_FETCH_ERROR
+)
 async def get_grounding_system(supabase: Client, project_id: str) -> Optional[Dict[str, Any]]:
     """
     Fetch grounding system details from grounding_details table
@@ -421,38 +950,149 @@ async def get_grounding_system(supabase: Client, project_id: str) -> Optional[Di
     """
     try:
         # Query grounding_details table instead of projects
-        response = supabase.table('grounding_details').select('*').eq('project_id', project_id).single().execute()
-
-        if not response.data:
-            return {
-                "grounding_electrode_conductor": "Not configured",
-                "grounding_electrode_type": "Not configured",
-                "electrodes": [],
-                "bonding": [],
-                "gec_size": "Not specified",
-                "notes": ""
-            }
-
-        grounding = response.data
-
-        # Format for agent context
-        # Map gec_size to grounding_electrode_conductor (what agent expects)
-        # Join electrodes array into readable string for grounding_electrode_type
+        # limit(1) instead of single(): a project without grounding details is an
+        # empty result (reported as "Not configured"), not an error
+        response = await _execute(supabase.table('grounding_details').select(GROUNDING_COLUMNS).eq('project_id', project_id).limit(1))
+        return _format_grounding(response.data[0] if response.data else None)
+    except _QUERY_ERRORS as e:
+        logger.error("Error fetching grounding for project %s: %s", project_id, e)
+        _record_query_failure('grounding')
         return {
-            "grounding_electrode_conductor": grounding.get('gec_size', 'Not specified'),
-            "grounding_electrode_type": ', '.join(grounding.get('electrodes', [])) if grounding.get('electrodes') else 'Not configured',
-            "bonding": ', '.join(grounding.get('bonding', [])) if grounding.get('bonding') else 'Not configured',
-            "electrodes": grounding.get('electrodes', []),
-            "gec_size": grounding.get('gec_size', 'Not specified'),
-            "notes": grounding.get('notes', '')
+            "grounding_electrode_conductor": _GROUNDING_FETCH_ERROR,
+            "grounding_electrode_type": _GROUNDING_FETCH_ERROR,
+            "electrodes": [],
+            "bonding": [],
+            "gec_size": _GROUNDING_FETCH_ERROR,
+            "notes": ""
         }
-    except Exception as e:
-        logger.error(f"Error fetching grounding for project {project_id}: {e}")
+
+
+def _format_grounding(grounding: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the agent-facing grounding summary from a grounding_details row (or None)"""
+    if not grounding:
         return {
-            "grounding_electrode_conductor": "Error fetching data",
-            "grounding_electrode_type": "Error fetching data",
+            "grounding_electrode_conductor": "Not configured",
+            "grounding_electrode_type": "Not configured",
             "electrodes": [],
             "bonding": [],
-            "gec_size": "Error fetching data",
+            "gec_size": "Not specified",
             "notes": ""
         }
+
+    electrodes = grounding.get('electrodes') or []
+    bonding = grounding.get('bonding') or []
+    gec_size = grounding.get('gec_size', 'Not specified')
+
+    # Format for agent context
+    # Map gec_size to grounding_electrode_conductor (what agent expects)
+    # Join electrodes array into readable string for grounding_electrode_type
+    return {
+        "grounding_electrode_conductor": gec_size,
+        "grounding_electrode_type": ', '.join(electrodes) if electrodes else 'Not configured',
+        "bonding": ', '.join(bonding) if bonding else 'Not configured',
+        "electrodes": electrodes,
+        "gec_size": gec_size,
+        "notes": grounding.get('notes', '')
+    }
+
+
+# Columns of the bundled rows (match the get_project_bundle SQL function)
+BUNDLE_PANEL_COLUMNS = 'id,name,bus_rating,voltage,phase'
+BUNDLE_FEEDER_COLUMNS = 'name,phase_conductor_size,conductor_material,distance_ft,voltage_drop_percent'
+BUNDLE_ISSUE_COLUMNS = 'severity,description'
+BUNDLE_RFI_COLUMNS = 'subject,status'
+BUNDLE_RFI_LIMIT = 5
+
+
+@async_ttl_cache(
+    ttl=CACHE_TTL_SECONDS,
+    maxsize=CACHE_MAXSIZE,
+    cache_if=lambda r: r is not None and not r.get('partial')
+)
+async def get_project_bundle(supabase: Client, project_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the agent project snapshot, in one round trip when possible
+
+    Calls the `get_project_bundle` Postgres function, which returns the project
+    row with its panels (including circuit_count), feeders, open issues, five
+    most recent RFIs and grounding details as one JSON document. If the
+    function is not deployed, the same snapshot is assembled from concurrent
+    table queries.
+
+    Args:
+        supabase: Supabase client
+        project_id: Project UUID
+
+    Returns:
+        Dict with project, panels, feeders, issues, rfis, grounding (formatted
+        like get_grounding_system) and, when the bundle function supplies the
+        connected load, service_utilization. A snapshot assembled after a
+        failed query has partial=True and is not cached. None if the project
+        is not found.
+    """
+    try:
+        response = await _execute(supabase.rpc('get_project_bundle', {'p_project_id': project_id}))
+        bundle = response.data
+        if not bundle or not bundle.get('project'):
+            return None
+        bundle['grounding'] = _format_grounding(bundle.get('grounding'))
+    except _QUERY_ERRORS as e:
+        logger.warning("get_project_bundle RPC failed for %s, using table queries: %s", project_id, e)
+        bundle = await _assemble_project_bundle(supabase, project_id)
+        if bundle is None:
+            return None
+
+    load_va = bundle.pop('load_va', None)
+    if load_va is not None:
+        bundle['service_utilization'] = _summarize_service_utilization(bundle['project'], float(load_va))
+    return bundle
+
+
+async def _assemble_project_bundle(supabase: Client, project_id: str) -> Optional[Dict[str, Any]]:
+    """Build the get_project_bundle snapshot from individual table queries"""
+    # An unknown project needs no further queries
+    project = await get_project_data(supabase, project_id)
+    if not project:
+        return None
+
+    # Failures the helpers log and swallow are collected so the incomplete
+    # snapshot is not cached (gather's child tasks share this context's list)
+    failures: List[str] = []
+    token = _query_failures.set(failures)
+    try:
+        # The remaining queries are independent; one failing part must not sink
+        # the whole snapshot, so each falls back to its empty value
+        names = ('panels', 'feeders', 'issues', 'rfis', 'grounding')
+        results = await asyncio.gather(
+            get_all_panels(supabase, project_id, columns=BUNDLE_PANEL_COLUMNS),
+            get_all_feeders(supabase, project_id, columns=BUNDLE_FEEDER_COLUMNS),
+            get_all_issues(supabase, project_id, columns=BUNDLE_ISSUE_COLUMNS),
+            get_recent_rfis(supabase, project_id, limit=BUNDLE_RFI_LIMIT, columns=BUNDLE_RFI_COLUMNS),
+            get_grounding_system(supabase, project_id),
+            return_exceptions=True
+        )
+        bundle: Dict[str, Any] = {'project': project}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error("Error fetching %s for project %s: %s", name, project_id, result)
+                failures.append(name)
+                result = _format_grounding(None) if name == 'grounding' else []
+            elif isinstance(result, _FailedRows):
+                # Failed fetch shared with a concurrent caller (recorded in its context)
+                failures.append(name)
+            bundle[name] = result
+
+        # Circuit counts per panel - one query for all panels
+        circuits_by_panel = await get_circuits_for_panels(
+            supabase, [panel['id'] for panel in bundle['panels']], columns='panel_id'
+        )
+    finally:
+        _query_failures.reset(token)
+
+    bundle['panels'] = [
+        {**panel, 'circuit_count': len(circuits_by_panel[panel['id']])}
+        for panel in bundle['panels']
+    ]
+    if failures:
+        bundle['partial'] = True
+    return bundle
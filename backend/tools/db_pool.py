@@ -0,0 +1,130 @@
+"""
+Direct Postgres connection pool for hot read paths
+
+When DATABASE_URL is configured, the read-heavy database tools query Postgres
+through a small asyncpg pool (binary protocol, pooled TCP connections, cached
+prepared statements) instead of JSON over PostgREST. Without it, every tool
+keeps using the Supabase client.
+
+Rows are returned in the same shape PostgREST produces (UUIDs and timestamps
+as strings, numerics as floats, json/jsonb decoded), so callers do not care
+which path served them.
+"""
+
+from config import settings
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import asyncpg
+import logging
+import orjson
+import re
+
+logger = logging.getLogger(__name__)
+
+# Keep pool_size x worker processes well below the Supabase connection limit (60)
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 10
+POOL_MAX_INACTIVE_SECONDS = 300
+
+_pool: Optional[asyncpg.Pool] = None
+
+_IDENTIFIER = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+async def init_pool() -> None:
+    """Open the pool at startup (no-op when DATABASE_URL is not set)"""
+    global _pool
+    if not settings.database_url or _pool is not None:
+        return
+
+    try:
+        _pool = await asyncpg.create_pool(
+            settings.database_url,
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=POOL_MAX_INACTIVE_SECONDS,
+            init=_init_connection
+        )
+        logger.info("Postgres connection pool ready")
+    except Exception as e:
+        logger.warning("Postgres pool unavailable, reads use PostgREST: %s", e)
+
+
+async def close_pool() -> None:
+    """Close the pool at shutdown"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool() -> Optional[asyncpg.Pool]:
+    """
+    Get the pool if direct reads are enabled
+
+    Returns:
+        The asyncpg pool, or None to use PostgREST
+    """
+    return _pool
+
+
+def select_list(columns: str) -> str:
+    """
+    Translate a PostgREST column projection ('*' or 'a,b,c') into a SQL select list
+
+    Args:
+        columns: Projection used by the database tools
+
+    Returns:
+        Quoted SQL column list
+
+    Raises:
+        ValueError: If the projection is not a plain column list
+    """
+    if columns == '*':
+        return '*'
+    names = [name.strip() for name in columns.split(',')]
+    if not all(_IDENTIFIER.match(name) for name in names):
+        raise ValueError(f"Unsupported column projection: {columns}")
+    return ', '.join(f'"{name}"' for name in names)
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Decode json/jsonb columns to Python values, as PostgREST does"""
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(
+            type_name,
+            encoder=lambda value: orjson.dumps(value).decode(),
+            decoder=orjson.loads,
+            schema='pg_catalog'
+        )
+
+
+def _to_json_value(value: Any) -> Any:
+    """Convert asyncpg values to the JSON types PostgREST returns"""
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+async def fetch_rows(pool: asyncpg.Pool, sql: str, *args: Any) -> List[Dict[str, Any]]:
+    """
+    Run a read query on a pooled connection
+
+    Args:
+        pool: Pool from get_pool()
+        sql: Parameterized SQL ($1, $2, ...)
+        *args: Query parameters
+
+    Returns:
+        List of row dicts
+    """
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(sql, *args)
+    return [{key: _to_json_value(value) for key, value in row.items()} for row in rows]
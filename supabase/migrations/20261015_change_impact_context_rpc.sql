@@ -0,0 +1,29 @@
+-- Change Impact agent context in a single round trip
+-- The Python backend's change impact agent needs the project row, all of its
+-- panels and all of its circuits to build its system prompt. Returning them as
+-- one JSONB document replaces several PostgREST requests per analysis.
+-- Utilization math stays in the backend (tools/database.py) so there is one
+-- source of truth for capacity verdicts.
+
+CREATE OR REPLACE FUNCTION public.get_change_impact_context(p_project_id UUID)
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'project', to_jsonb(p),
+    'panels', COALESCE(
+      (SELECT jsonb_agg(to_jsonb(pn)) FROM public.panels pn WHERE pn.project_id = p.id),
+      '[]'::jsonb
+    ),
+    'circuits', COALESCE(
+      (SELECT jsonb_agg(to_jsonb(c)) FROM public.circuits c WHERE c.project_id = p.id),
+      '[]'::jsonb
+    )
+  )
+  FROM public.projects p
+  WHERE p.id = p_project_id;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION public.get_change_impact_context(UUID) IS
+  'Project row plus its panels and circuits as one JSONB document (change impact agent context).';
+
+-- Runs as the caller (RLS applies); the backend calls it with the service role
+GRANT EXECUTE ON FUNCTION public.get_change_impact_context(UUID) TO service_role;
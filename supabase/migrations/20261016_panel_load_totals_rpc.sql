@@ -0,0 +1,25 @@
+-- Panel utilization inputs in a single round trip
+-- The Python backend's get_panel_utilization needs the panel row plus the
+-- total connected load, poles used and circuit count of its circuits.
+-- Aggregating here avoids a second request and transferring every circuit row.
+-- Utilization math stays in the backend (tools/database.py).
+
+CREATE OR REPLACE FUNCTION public.get_panel_load_totals(p_panel_id UUID)
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'panel', to_jsonb(p),
+    'total_load_va', COALESCE(SUM(c.load_watts), 0),
+    'poles_used', COALESCE(SUM(COALESCE(c.pole, 1)), 0),
+    'circuit_count', COUNT(c.id)
+  )
+  FROM public.panels p
+  LEFT JOIN public.circuits c ON c.panel_id = p.id
+  WHERE p.id = p_panel_id
+  GROUP BY p.id;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION public.get_panel_load_totals(UUID) IS
+  'Panel row plus aggregated circuit load, poles used and circuit count (panel utilization).';
+
+-- Runs as the caller (RLS applies); the backend calls it with the service role
+GRANT EXECUTE ON FUNCTION public.get_panel_load_totals(UUID) TO service_role;
@@ -0,0 +1,9 @@
+-- Pending agent actions listing
+-- GET /api/agent-actions/{project_id} filters pending actions by user and
+-- project and pages through them by priority, newest first. A partial index in
+-- that order serves each page with an index scan and stays small because
+-- reviewed actions drop out of it.
+
+CREATE INDEX IF NOT EXISTS idx_agent_actions_pending
+  ON public.agent_actions(user_id, project_id, priority DESC, created_at DESC)
+  WHERE status = 'pending';
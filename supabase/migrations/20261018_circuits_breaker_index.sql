@@ -0,0 +1,7 @@
+-- Large load lookups
+-- The Python backend's get_large_loads filters a project's circuits by
+-- breaker_amps >= N and orders them largest first. This index lets Postgres
+-- answer that with a range scan in the requested order.
+
+CREATE INDEX IF NOT EXISTS idx_circuits_project_breaker
+  ON public.circuits(project_id, breaker_amps DESC);
@@ -0,0 +1,101 @@
+-- Denormalized connected load per project
+-- The Python backend's get_service_utilization needs the total connected load
+-- of the circuits on a project's panels. Keeping that total in its own table
+-- (maintained by statement-level triggers on circuits) turns the read into a
+-- single-row fetch. Circuits without a panel are not counted, matching the
+-- backend's sum.
+--
+-- The total deliberately does not live on public.projects: updating the
+-- project row on circuit writes would bump projects.updated_at, fire the
+-- frontend's realtime subscription on projects and serialize concurrent
+-- circuit writes on the project row lock.
+
+CREATE TABLE IF NOT EXISTS public.project_load_totals (
+  project_id UUID PRIMARY KEY REFERENCES public.projects(id) ON DELETE CASCADE,
+  load_va NUMERIC NOT NULL DEFAULT 0
+);
+
+COMMENT ON TABLE public.project_load_totals IS
+  'Sum of circuits.load_watts over circuits assigned to a panel, per project; maintained by the trg_circuits_project_load_* triggers';
+
+-- Backend-only (service role bypasses RLS); no client policies
+ALTER TABLE public.project_load_totals ENABLE ROW LEVEL SECURITY;
+
+-- ============================================================================
+-- TRIGGER FUNCTION
+-- ============================================================================
+
+-- Applies the net load change of one circuits statement, one upsert per project.
+-- Deltas for projects deleted in the same statement (cascades) are skipped.
+CREATE OR REPLACE FUNCTION public.refresh_project_load()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO public.project_load_totals AS t (project_id, load_va)
+      SELECT n.project_id, SUM(n.load_watts)
+      FROM new_rows n
+      JOIN public.projects p ON p.id = n.project_id
+      WHERE n.panel_id IS NOT NULL
+      GROUP BY n.project_id
+      ON CONFLICT (project_id) DO UPDATE SET load_va = t.load_va + EXCLUDED.load_va;
+
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO public.project_load_totals AS t (project_id, load_va)
+      SELECT o.project_id, -SUM(o.load_watts)
+      FROM old_rows o
+      JOIN public.projects p ON p.id = o.project_id
+      WHERE o.panel_id IS NOT NULL
+      GROUP BY o.project_id
+      ON CONFLICT (project_id) DO UPDATE SET load_va = t.load_va + EXCLUDED.load_va;
+
+  ELSE
+    INSERT INTO public.project_load_totals AS t (project_id, load_va)
+      SELECT d.project_id, SUM(d.load_va)
+      FROM (
+        SELECT n.project_id, n.load_watts AS load_va FROM new_rows n WHERE n.panel_id IS NOT NULL
+        UNION ALL
+        SELECT o.project_id, -o.load_watts FROM old_rows o WHERE o.panel_id IS NOT NULL
+      ) d
+      JOIN public.projects p ON p.id = d.project_id
+      GROUP BY d.project_id
+      HAVING SUM(d.load_va) <> 0
+      ON CONFLICT (project_id) DO UPDATE SET load_va = t.load_va + EXCLUDED.load_va;
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS trg_circuits_project_load_insert ON public.circuits;
+DROP TRIGGER IF EXISTS trg_circuits_project_load_update ON public.circuits;
+DROP TRIGGER IF EXISTS trg_circuits_project_load_delete ON public.circuits;
+
+CREATE TRIGGER trg_circuits_project_load_insert
+  AFTER INSERT ON public.circuits
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.refresh_project_load();
+
+CREATE TRIGGER trg_circuits_project_load_update
+  AFTER UPDATE ON public.circuits
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.refresh_project_load();
+
+CREATE TRIGGER trg_circuits_project_load_delete
+  AFTER DELETE ON public.circuits
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.refresh_project_load();
+
+-- ============================================================================
+-- BACKFILL
+-- ============================================================================
+
+INSERT INTO public.project_load_totals (project_id, load_va)
+  SELECT p.id, COALESCE(SUM(c.load_watts), 0)
+  FROM public.projects p
+  LEFT JOIN public.circuits c ON c.project_id = p.id AND c.panel_id IS NOT NULL
+  GROUP BY p.id
+  ON CONFLICT (project_id) DO UPDATE SET load_va = EXCLUDED.load_va;
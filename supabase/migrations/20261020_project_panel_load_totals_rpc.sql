@@ -0,0 +1,28 @@
+-- Per-panel load totals for a whole project in a single round trip
+-- The Python backend sums connected load per panel for service and panel
+-- utilization. Aggregating here returns one small row per panel instead of
+-- every circuit row. Utilization math stays in the backend (tools/database.py).
+
+CREATE OR REPLACE FUNCTION public.get_project_panel_load_totals(p_project_id UUID)
+RETURNS TABLE (
+  panel_id UUID,
+  total_load_va NUMERIC,
+  poles_used BIGINT,
+  circuit_count BIGINT
+) AS $$
+  SELECT
+    p.id,
+    COALESCE(SUM(c.load_watts), 0),
+    COALESCE(SUM(COALESCE(c.pole, 1)), 0),
+    COUNT(c.id)
+  FROM public.panels p
+  LEFT JOIN public.circuits c ON c.panel_id = p.id
+  WHERE p.project_id = p_project_id
+  GROUP BY p.id;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION public.get_project_panel_load_totals(UUID) IS
+  'Aggregated circuit load, poles used and circuit count for every panel in a project.';
+
+-- Runs as the caller (RLS applies); the backend calls it with the service role
+GRANT EXECUTE ON FUNCTION public.get_project_panel_load_totals(UUID) TO service_role;
@@ -0,0 +1,79 @@
+-- Agent project snapshot in a single round trip
+-- The Python backend's predictive inspector and RFI drafter build their system
+-- prompts from the project row, panels (with circuit counts), feeders, open
+-- issues, recent RFIs and grounding details, plus the connected load kept in
+-- project_load_totals. Returning them as one JSONB document replaces up to
+-- eight PostgREST requests per agent run.
+-- Only the columns the prompts and tools read are included.
+
+CREATE OR REPLACE FUNCTION public.get_project_bundle(p_project_id UUID)
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'project', to_jsonb(p),
+    'load_va', COALESCE(
+      (SELECT t.load_va FROM public.project_load_totals t WHERE t.project_id = p.id),
+      0
+    ),
+    'panels', COALESCE(
+      (SELECT jsonb_agg(jsonb_build_object(
+          'id', pn.id,
+          'name', pn.name,
+          'bus_rating', pn.bus_rating,
+          'voltage', pn.voltage,
+          'phase', pn.phase,
+          'circuit_count', (SELECT COUNT(*) FROM public.circuits c WHERE c.panel_id = pn.id)
+        ))
+        FROM public.panels pn
+        WHERE pn.project_id = p.id),
+      '[]'::jsonb
+    ),
+    'feeders', COALESCE(
+      (SELECT jsonb_agg(jsonb_build_object(
+          'name', f.name,
+          'phase_conductor_size', f.phase_conductor_size,
+          'conductor_material', f.conductor_material,
+          'distance_ft', f.distance_ft,
+          'voltage_drop_percent', f.voltage_drop_percent
+        ))
+        FROM public.feeders f
+        WHERE f.project_id = p.id),
+      '[]'::jsonb
+    ),
+    'issues', COALESCE(
+      (SELECT jsonb_agg(jsonb_build_object('severity', i.severity, 'description', i.description))
+        FROM public.issues i
+        WHERE i.project_id = p.id AND i.status = 'Open'),
+      '[]'::jsonb
+    ),
+    'rfis', COALESCE(
+      (SELECT jsonb_agg(jsonb_build_object('subject', r.subject, 'status', r.status) ORDER BY r.created_at DESC)
+        FROM (
+          SELECT subject, status, created_at
+          FROM public.rfis
+          WHERE project_id = p.id
+          ORDER BY created_at DESC
+          LIMIT 5
+        ) r),
+      '[]'::jsonb
+    ),
+    'grounding', (
+      SELECT jsonb_build_object(
+        'gec_size', g.gec_size,
+        'electrodes', g.electrodes,
+        'bonding', g.bonding,
+        'notes', g.notes
+      )
+      FROM public.grounding_details g
+      WHERE g.project_id = p.id
+      LIMIT 1
+    )
+  )
+  FROM public.projects p
+  WHERE p.id = p_project_id;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION public.get_project_bundle(UUID) IS
+  'Project row plus connected load, panels (with circuit counts), feeders, open issues, recent RFIs and grounding as one JSONB document (agent context).';
+
+-- Runs as the caller (RLS applies); the backend calls it with the service role
+GRANT EXECUTE ON FUNCTION public.get_project_bundle(UUID) TO service_role;
@@ -0,0 +1,18 @@
+-- Indexes for the agent backend's read queries (backend/tools/database.py)
+-- panels(project_id), circuits(project_id), circuits(panel_id),
+-- feeders(project_id) and grounding_details(project_id) are already indexed.
+-- These cover the remaining filter / order combinations.
+
+-- Panel load totals (get_panel_load_totals, get_project_panel_load_totals):
+-- SUM(load_watts) / SUM(pole) per panel as an index-only scan
+CREATE INDEX IF NOT EXISTS idx_circuits_panel_load
+  ON public.circuits(panel_id) INCLUDE (load_watts, pole);
+
+-- Open issues per project (get_all_issues filters status = 'Open')
+CREATE INDEX IF NOT EXISTS idx_issues_project_open
+  ON public.issues(project_id)
+  WHERE status = 'Open';
+
+-- Most recent RFIs per project (ORDER BY created_at DESC LIMIT n)
+CREATE INDEX IF NOT EXISTS idx_rfis_project_created
+  ON public.rfis(project_id, created_at DESC);
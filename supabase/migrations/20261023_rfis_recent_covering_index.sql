@@ -0,0 +1,11 @@
+-- Covering index for recent RFIs
+-- The agent backend reads only subject and status of a project's most recent
+-- RFIs (get_recent_rfis / get_project_bundle). Including them in the
+-- (project_id, created_at DESC) index lets Postgres answer the query with an
+-- index-only scan, without sorting or visiting the heap.
+-- Open issues are already served by the partial idx_issues_project_open.
+
+DROP INDEX IF EXISTS public.idx_rfis_project_created;
+
+CREATE INDEX idx_rfis_project_created
+  ON public.rfis(project_id, created_at DESC) INCLUDE (subject, status);